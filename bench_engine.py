@@ -0,0 +1,247 @@
+"""bench_engine.py
+
+Engine benchmark: steps per second and per-step latency percentiles for
+the configurations the simulator is used in, written to JSON and
+compared against a stored baseline.
+
+    python bench_engine.py --json bench.json
+    python bench_engine.py --baseline bench.json [--tolerance 0.10] [--strict]
+
+Configurations (see cases()):
+- SimulationCore on the built-in connectome and on every Excel model
+  found in the workbook (herm / male / juvenile), each as a base run
+  plus one-factor variants: gap junctions off, food stimulus, touch
+  stimulus, forced functions (Locomotion), state logging, and all of
+  them at once;
+- EnsembleEngine on the built-in connectome with 1, 10, 100 and 1000
+  worms (food stimulus on every worm).
+
+Every run is seeded, warmed up, then timed step by step.  A case is a
+regression when its steps/s falls more than `tolerance` below the
+baseline; --strict makes that the exit status (for CI).  No pygame.
+"""
+
+from __future__ import annotations
+
+import argparse
+import glob
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from connectome import createpostsynaptic, postsynaptic
+from ensemble import EnsembleEngine
+from excel_matrix_pylightxl import build_models, list_sheets, pylightxl_available
+from simulation_core import SimulationCore
+
+FORMAT_VERSION = 1
+ENSEMBLE_SIZES = (1, 10, 100, 1000)
+LOCOMOTION = 'Locomotion'  # worm_functions entry used for "forced functions on"
+
+
+@dataclass
+class Case:
+    name: str
+    network: str                      # network spec (SimulationCore.load_network)
+    stimuli: Tuple[str, ...] = ()
+    forced: bool = False
+    log: bool = False
+    worms: int = 0                    # > 0: EnsembleEngine with this many worms
+
+
+def default_workbook() -> Optional[str]:
+    here = os.path.dirname(os.path.abspath(__file__))
+    found = sorted(glob.glob(os.path.join(here, "neuralNetwork_xlsx", "*.xlsx")))
+    return found[0] if found else None
+
+
+def cases(xlsx_path: Optional[str]) -> List[Case]:
+    networks = [("builtin", "builtin", None)]
+    if xlsx_path and pylightxl_available():
+        for model in build_models(list_sheets(xlsx_path)):
+            networks.append((model["key"], f"xlsx:{xlsx_path}:{model['chem']}", model["gap"] or None))
+
+    out = []
+    for label, spec, gap_sheet in networks:
+        base = spec if gap_sheet is None else f"{spec}|{gap_sheet}"
+        out.append(Case(f"{label}", base))
+        if gap_sheet is not None:
+            out.append(Case(f"{label}/gap-off", spec))
+        out.append(Case(f"{label}/food", base, stimuli=("food",)))
+        out.append(Case(f"{label}/touch", base, stimuli=("touch",)))
+        out.append(Case(f"{label}/forced", base, forced=True))
+        out.append(Case(f"{label}/log", base, log=True))
+        out.append(Case(f"{label}/all", base, stimuli=("food", "touch"), forced=True, log=True))
+    for n in ENSEMBLE_SIZES:
+        out.append(Case(f"ensemble/{n}", "builtin", stimuli=("food",), worms=n))
+    return out
+
+
+def _fresh_core(seed: int) -> SimulationCore:
+    # Excel loads add their neurons to postsynaptic and unloading keeps
+    # them, so every case starts from the store of a fresh launch
+    postsynaptic.clear()
+    createpostsynaptic()
+    return SimulationCore(seed=seed)
+
+
+def _core(case: Case, seed: int, log_dir: str) -> Tuple[SimulationCore, Callable[[], None]]:
+    sim = _fresh_core(seed)
+    sim.log_format = None
+    if not sim.load_network(case.network):
+        raise RuntimeError(sim.excel_status)
+    for stimulus in case.stimuli:
+        sim.add_stimulus(stimulus)
+    if case.forced:
+        for func in sim.worm_functions:
+            if func['name'].startswith(LOCOMOTION):
+                func['active'] = True
+    sim.start_simulation()
+    if case.log:
+        sim.log_format = 'binary'
+        sim.open_log(os.path.join(log_dir, case.name.replace("/", "_")))
+    sim.trigger_random_initialization('all')
+    return sim, sim.step_simulation
+
+
+def _ensemble(case: Case, seed: int) -> Tuple[EnsembleEngine, Callable[[], None]]:
+    sim = _fresh_core(seed)
+    sim.log_format = None
+    sim.load_network(case.network)
+    sim.start_simulation()
+    engine = EnsembleEngine(sim.compiled_network, case.worms, seed=seed)
+    engine.randomize(sim.random_init_min, sim.random_init_max)
+
+    def step():
+        if "food" in case.stimuli:
+            engine.stimulate_food()
+        engine.step()
+    return engine, step
+
+
+def run_case(case: Case, steps: int, warmup: int, seed: int) -> dict:
+    """Time one case; per-step latencies in microseconds."""
+    with tempfile.TemporaryDirectory() as log_dir:
+        if case.worms:
+            owner, step = _ensemble(case, seed)
+            # keep roughly the same worm-steps per case
+            steps = max(20, steps * 10 // max(case.worms, 10))
+            warmup = min(warmup, steps)
+        else:
+            owner, step = _core(case, seed, log_dir)
+        for _ in range(warmup):
+            step()
+        latency = np.empty(steps)
+        start = time.perf_counter()
+        for i in range(steps):
+            t = time.perf_counter()
+            step()
+            latency[i] = time.perf_counter() - t
+        elapsed = time.perf_counter() - start
+        if not case.worms:
+            owner.shutdown()  # flushes / closes the log inside the timed directory
+
+    p50, p90, p99 = np.percentile(latency, [50, 90, 99]) * 1e6
+    result = {
+        "steps": steps,
+        "neurons": len(postsynaptic),
+        "steps_per_second": steps / elapsed,
+        "p50_us": p50, "p90_us": p90, "p99_us": p99,
+        "max_us": float(latency.max()) * 1e6,
+    }
+    if case.worms:
+        result["worms"] = case.worms
+        result["worm_steps_per_second"] = steps * case.worms / elapsed
+    return result
+
+
+def environment() -> dict:
+    try:
+        import scipy
+        scipy_version = scipy.__version__
+    except Exception:
+        scipy_version = None
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "scipy": scipy_version,
+        "machine": platform.machine(),
+        "processor": platform.processor() or platform.machine(),
+        "system": platform.system(),
+    }
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float) -> Dict[str, dict]:
+    """Per-case ratio to the baseline steps/s ('regression' below 1 - tolerance)."""
+    out = {}
+    for name, result in results.items():
+        ref = baseline.get(name)
+        if ref is None:
+            continue
+        ratio = result["steps_per_second"] / max(ref["steps_per_second"], 1e-12)
+        status = "regression" if ratio < 1.0 - tolerance else ("improvement" if ratio > 1.0 + tolerance else "same")
+        out[name] = {"baseline_steps_per_second": ref["steps_per_second"], "ratio": ratio, "status": status}
+    return out
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Nemabot engine benchmark")
+    parser.add_argument("--steps", type=int, default=500, help="timed steps per case (default: 500)")
+    parser.add_argument("--warmup", type=int, default=50, help="untimed steps before timing (default: 50)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--xlsx", default=default_workbook(), help="workbook of the Excel models")
+    parser.add_argument("--only", metavar="TEXT", help="only cases whose name contains TEXT")
+    parser.add_argument("--json", metavar="PATH", help="write the results here")
+    parser.add_argument("--baseline", metavar="PATH", help="compare against an earlier --json output")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed steps/s drop (default: 0.10)")
+    parser.add_argument("--strict", action="store_true", help="exit with status 1 on any regression")
+    args = parser.parse_args(argv)
+
+    selected = [c for c in cases(args.xlsx) if not args.only or args.only in c.name]
+    results = {}
+    print(f"{'case':<22}{'neurons':>8}{'steps/s':>12}{'p50 us':>10}{'p99 us':>10}")
+    for case in selected:
+        result = run_case(case, args.steps, args.warmup, args.seed)
+        results[case.name] = result
+        print(f"{case.name:<22}{result['neurons']:>8}{result['steps_per_second']:>12,.0f}"
+              f"{result['p50_us']:>10.1f}{result['p99_us']:>10.1f}")
+
+    report = {
+        "version": FORMAT_VERSION,
+        "created": time.strftime('%Y-%m-%d %H:%M:%S'),
+        "environment": environment(),
+        "settings": {"steps": args.steps, "warmup": args.warmup, "seed": args.seed,
+                     "xlsx": os.path.basename(args.xlsx) if args.xlsx else None},
+        "results": results,
+    }
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        comparison = compare(results, baseline.get("results", {}), args.tolerance)
+        report["baseline"] = {"path": args.baseline, "created": baseline.get("created"),
+                              "tolerance": args.tolerance, "cases": comparison}
+        print(f"\nvs {args.baseline} (tolerance {args.tolerance:.0%})")
+        for name, c in comparison.items():
+            print(f"{name:<22}{c['ratio']:>8.2f}x  {c['status']}")
+            if c["status"] == "regression":
+                regressions.append(name)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+    return 1 if regressions and args.strict else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,228 @@
+"""bench_render.py
+
+Rendering benchmark: frame-time distributions of every screen module,
+drawn offscreen (SDL dummy video driver) at 1080p and 4K, written to JSON
+and compared against a stored baseline.
+
+    python bench_render.py --json render.json
+    python bench_render.py --baseline render.json [--tolerance 0.15] [--strict]
+
+The simulator state is scripted: seeded run, a fixed set of watched
+neurons, food on and the Locomotion function forced, stepped for a short
+(`--short`, default 200) and a long history (the full curve horizon,
+trace_buffer.DEFAULT_HORIZON).  Each case draws `--frames` frames of one
+screen, advancing the simulation one step between frames (untimed) so
+the screens see changing state, and counting frames like the main loop
+so partial redraws (screen_matrix) behave as in the app.  The timed part
+is the screen's draw() alone: with the dummy driver there is no real
+flip to measure.
+
+A case is a regression when its median frame time grows by more than
+`tolerance` over the baseline; --strict makes that the exit status.
+"""
+
+from __future__ import annotations
+
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import argparse
+import json
+import random
+import sys
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pygame
+
+import screen_curve
+import screen_forced_functions
+import screen_help
+import screen_matrix
+import screen_menu
+import screen_movement
+import screen_options
+import screen_wave
+import screen_worm
+from bench_engine import environment
+from connectome import postsynaptic
+from simulator import Simulator
+from trace_buffer import DEFAULT_HORIZON
+
+FORMAT_VERSION = 1
+RESOLUTIONS = {"1080p": False, "4k": True}  # name -> sim.is_4k_mode
+WATCHED = ('AVAL', 'AVAR', 'AVBL', 'AVBR', 'DA1', 'DB1', 'VA1', 'VB1',
+           'MDL07', 'MDR07', 'MVL07', 'MVR07', 'ADFL', 'ASHL', 'PVCL', 'RIML')
+LOCOMOTION = 'Locomotion'
+
+# name -> (module, display flag, extra sim attributes)
+SCREENS = {
+    'matrix': (screen_matrix, 'display_neuron_matrix', {'matrix_view': 'circles'}),
+    'matrix-heatmap': (screen_matrix, 'display_neuron_matrix', {'matrix_view': 'heatmap'}),
+    'curve': (screen_curve, 'display_curve_screen', {}),
+    'wave': (screen_wave, 'display_wave_screen', {}),
+    'worm': (screen_worm, 'display_worm_screen', {}),
+    'movement': (screen_movement, 'display_movement_screen', {}),
+    'menu': (screen_menu, 'display_menu_screen', {}),
+    'help': (screen_help, 'display_help_screen', {}),
+    'options': (screen_options, 'display_options_screen', {}),
+    'forced_functions': (screen_forced_functions, 'display_forced_functions_screen', {}),
+}
+DISPLAY_FLAGS = sorted({flag for _, flag, _ in SCREENS.values()})
+
+
+@dataclass
+class Case:
+    name: str
+    screen: str
+    resolution: str
+    history: str
+
+
+def cases(histories) -> List[Case]:
+    return [Case(f"{screen}/{resolution}/{history}", screen, resolution, history)
+            for history in histories for resolution in RESOLUTIONS for screen in SCREENS]
+
+
+def scripted_simulator(steps: int, seed: int) -> Simulator:
+    """Simulator in a reproducible state after `steps` iterations."""
+    random.seed(seed)  # screen_movement places its world with `random`
+    sim = Simulator()
+    sim.set_seed(seed)
+    sim.log_format = None
+    sim.add_stimulus('food')
+    for func in sim.worm_functions:
+        if func['name'].startswith(LOCOMOTION):
+            func['active'] = True
+    sim.start_simulation()
+    for name in WATCHED:
+        if name in postsynaptic:
+            sim.watch_neuron(name)
+    for _ in range(steps):
+        sim.step_simulation()
+    return sim
+
+
+def set_resolution(sim: Simulator, name: str) -> None:
+    if sim.is_4k_mode != RESOLUTIONS[name]:
+        sim.toggle_4k_mode()
+
+
+def show(sim: Simulator, screen: str) -> None:
+    """Select one screen the way nemabot.set_screen does."""
+    _, flag, extra = SCREENS[screen]
+    for other in DISPLAY_FLAGS:
+        setattr(sim, other, other == flag)
+    for attr, value in extra.items():
+        setattr(sim, attr, value)
+
+
+def run_case(sim: Simulator, case: Case, frames: int, warmup: int) -> dict:
+    """Time `frames` draws of one screen; frame times in milliseconds."""
+    module = SCREENS[case.screen][0]
+    set_resolution(sim, case.resolution)
+    show(sim, case.screen)
+    surface = sim.screen
+    rect = surface.get_rect()
+    times = np.empty(frames)
+    for i in range(warmup + frames):
+        sim.step_simulation()
+        t = time.perf_counter()
+        module.draw(sim, surface, rect)
+        elapsed = time.perf_counter() - t
+        sim.frame_count += 1
+        if i >= warmup:
+            times[i - warmup] = elapsed
+    times *= 1000.0
+    p50, p90, p99 = np.percentile(times, [50, 90, 99])
+    return {
+        "frames": frames,
+        "size": list(rect.size),
+        "mean_ms": float(times.mean()), "p50_ms": p50, "p90_ms": p90, "p99_ms": p99,
+        "max_ms": float(times.max()),
+    }
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float) -> Dict[str, dict]:
+    """Per-case ratio of the median frame time to the baseline's ('regression' above 1 + tolerance)."""
+    out = {}
+    for name, result in results.items():
+        ref = baseline.get(name)
+        if ref is None:
+            continue
+        ratio = result["p50_ms"] / max(ref["p50_ms"], 1e-9)
+        status = "regression" if ratio > 1.0 + tolerance else ("improvement" if ratio < 1.0 - tolerance else "same")
+        out[name] = {"baseline_p50_ms": ref["p50_ms"], "ratio": ratio, "status": status}
+    return out
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Nemabot rendering benchmark (offscreen)")
+    parser.add_argument("--frames", type=int, default=60, help="timed frames per case (default: 60)")
+    parser.add_argument("--warmup", type=int, default=5, help="untimed frames before timing (default: 5)")
+    parser.add_argument("--short", type=int, default=200, help="iterations of the short history (default: 200)")
+    parser.add_argument("--long", type=int, default=DEFAULT_HORIZON,
+                        help=f"iterations of the long history (default: {DEFAULT_HORIZON})")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--only", metavar="TEXT", help="only cases whose name contains TEXT")
+    parser.add_argument("--json", metavar="PATH", help="write the results here")
+    parser.add_argument("--baseline", metavar="PATH", help="compare against an earlier --json output")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed frame time growth (default: 0.15)")
+    parser.add_argument("--strict", action="store_true", help="exit with status 1 on any regression")
+    args = parser.parse_args(argv)
+
+    histories: Tuple[Tuple[str, int], ...] = (("short", args.short), ("long", args.long))
+    results = {}
+    print(f"{'case':<34}{'size':>11}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for history, steps in histories:
+        selected = [c for c in cases([history]) if not args.only or args.only in c.name]
+        if not selected:
+            continue
+        sim = scripted_simulator(steps, args.seed)
+        for case in selected:
+            result = run_case(sim, case, args.frames, args.warmup)
+            result["iteration"] = sim.iteration
+            results[case.name] = result
+            size = "x".join(map(str, result["size"]))
+            print(f"{case.name:<34}{size:>11}{result['p50_ms']:>9.2f}{result['p99_ms']:>9.2f}{result['max_ms']:>9.2f}")
+        sim.shutdown()
+
+    env = environment()
+    env.update({"pygame": pygame.version.ver, "sdl": ".".join(map(str, pygame.get_sdl_version())),
+                "video_driver": os.environ.get("SDL_VIDEODRIVER")})
+    report = {
+        "version": FORMAT_VERSION,
+        "created": time.strftime('%Y-%m-%d %H:%M:%S'),
+        "environment": env,
+        "settings": {"frames": args.frames, "warmup": args.warmup, "seed": args.seed,
+                     "histories": dict(histories)},
+        "results": results,
+    }
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        comparison = compare(results, baseline.get("results", {}), args.tolerance)
+        report["baseline"] = {"path": args.baseline, "created": baseline.get("created"),
+                              "tolerance": args.tolerance, "cases": comparison}
+        print(f"\nvs {args.baseline} (tolerance {args.tolerance:.0%})")
+        for name, c in comparison.items():
+            print(f"{name:<34}{c['ratio']:>8.2f}x  {c['status']}")
+            if c["status"] == "regression":
+                regressions.append(name)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+    return 1 if regressions and args.strict else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,8 @@
+from neuron_state import NeuronStateStore
+
 # The postsynaptic dictionary contains the accumulated weighted values as the
-# connectome is executed
-postsynaptic = {}
+# connectome is executed (struct-of-arrays store with a dict-compatible view)
+postsynaptic = NeuronStateStore()
 
 global nextState
 global nextState
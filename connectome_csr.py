@@ -0,0 +1,310 @@
+"""connectome_csr.py
+
+Compiled (CSR) connectome and vectorized step engine.
+
+Both network sources describe the same operation: when presynaptic neuron X
+fires, add w to the nextState of each of its targets.
+- connectome.py: one generated function per neuron (ADAL() ... VD13())
+- Excel loaders: an `edges` dict {presyn: [(postsyn, w), ...]}
+
+This module compiles either source once into integer neuron IDs and a CSR
+matrix (one row per presynaptic neuron: indptr / indices / weights), so that a
+simulation step becomes a fired-mask sparse matrix-vector product instead of
+one eval() plus dozens of dict lookups per firing neuron.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import connectome
+
+# Inverse decay used by run_connectome: factor = 1 - K / (decroissance + 1 + OFFSET)
+DECAY_K = 0.5
+DECAY_OFFSET = 5.0
+
+# decay factor per integer decroissance, grown on demand (decay_table) up to
+# DECAY_TABLE_MAX entries; longer decays use the formula
+DECAY_TABLE_MAX = 1 << 20
+_decay_table = np.zeros(0)
+
+
+class _ProbePostsynaptic(dict):
+    """Stand-in for connectome.postsynaptic that creates entries on demand."""
+
+    def __missing__(self, key):
+        row = [0, 0, 0, 0, 0]
+        self[key] = row
+        return row
+
+
+@dataclass
+class CompiledConnectome:
+    names: List[str]            # neuron ID -> name (postsynaptic key order)
+    indptr: np.ndarray          # int64, len(names) + 1
+    indices: np.ndarray         # int64, target neuron IDs
+    weights: np.ndarray         # float64, synaptic weights
+    index: Dict[str, int] = field(init=False)
+    can_fire: np.ndarray = field(init=False)     # False for muscles (they never fire)
+    edge_source: np.ndarray = field(init=False)  # presynaptic ID of each stored edge
+    _stimuli: Dict[Tuple[str, ...], np.ndarray] = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.index = {n: i for i, n in enumerate(self.names)}
+        self.can_fire = np.array([n[:3] not in connectome.muscles for n in self.names], dtype=bool)
+        self.edge_source = np.repeat(np.arange(len(self.names), dtype=np.int64), np.diff(self.indptr))
+        self._stimuli = {}
+
+    @property
+    def size(self) -> int:
+        return len(self.names)
+
+    @property
+    def nnz(self) -> int:
+        return int(self.indices.shape[0])
+
+    # ------------------------------------------------------------------
+    # Builders
+    # ------------------------------------------------------------------
+    @classmethod
+    def from_edges(cls, names: Sequence[str], edges: Dict[str, Iterable[Tuple[str, float]]]) -> "CompiledConnectome":
+        """Compile an `edges` dict over `names`.
+
+        Targets missing from `names` are dropped (same rule as
+        ExcelConnectomePylightxl.apply) and duplicate targets are summed.
+        """
+        names = list(names)
+        index = {n: i for i, n in enumerate(names)}
+        indptr = [0]
+        indices: List[int] = []
+        weights: List[float] = []
+        for src in names:
+            row: Dict[int, float] = {}
+            for dst, w in edges.get(src, ()):
+                j = index.get(dst)
+                if j is None or w == 0:
+                    continue
+                row[j] = row.get(j, 0.0) + float(w)
+            for j in sorted(row):
+                if row[j] != 0.0:
+                    indices.append(j)
+                    weights.append(row[j])
+            indptr.append(len(indices))
+        return cls(
+            names=names,
+            indptr=np.asarray(indptr, dtype=np.int64),
+            indices=np.asarray(indices, dtype=np.int64),
+            weights=np.asarray(weights, dtype=np.float64),
+        )
+
+    @classmethod
+    def from_builtin(cls, names: Optional[Sequence[str]] = None) -> "CompiledConnectome":
+        """Compile the hard-coded connectome.py functions.
+
+        Each generated function is run once against a probe dict standing in
+        for connectome.postsynaptic; the values it leaves in nextState are its
+        outgoing weights.  `names` defaults to the createpostsynaptic() order.
+        """
+        saved = connectome.postsynaptic
+        probe = _ProbePostsynaptic()
+        try:
+            connectome.postsynaptic = probe
+            connectome.createpostsynaptic()
+            builtin_names = list(probe.keys())
+            edges: Dict[str, List[Tuple[str, float]]] = {}
+            for src in builtin_names:
+                f = getattr(connectome, src, None)
+                if not callable(f):
+                    continue
+                probe.clear()
+                f()
+                edges[src] = [(dst, float(row[connectome.nextState])) for dst, row in probe.items()]
+        finally:
+            connectome.postsynaptic = saved
+        return cls.from_edges(builtin_names if names is None else names, edges)
+
+    @classmethod
+    def from_excel_connectome(cls, excel_connectome, names: Optional[Sequence[str]] = None) -> "CompiledConnectome":
+        return cls.from_edges(excel_connectome.neurons if names is None else names, excel_connectome.edges)
+
+    # ------------------------------------------------------------------
+    # Kernels
+    # ------------------------------------------------------------------
+    def row(self, src) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (target IDs, weights) of one presynaptic neuron (name or ID)."""
+        i = self.index.get(src) if isinstance(src, str) else int(src)
+        if i is None:
+            return self.indices[:0], self.weights[:0]
+        s, e = self.indptr[i], self.indptr[i + 1]
+        return self.indices[s:e], self.weights[s:e]
+
+    def accumulate(self, src, values: np.ndarray) -> None:
+        """values[targets] += weights for a single presynaptic neuron."""
+        targets, w = self.row(src)
+        values[targets] += w
+
+    def stimulus_vector(self, presynaptic: Iterable[str]) -> np.ndarray:
+        """Summed outgoing weights of a group of sensor neurons (read-only).
+
+        Compiled on first use and cached with the network, so applying a
+        sensor group is a single `values += intensity * vector`.
+        """
+        key = tuple(presynaptic)
+        vec = self._stimuli.get(key)
+        if vec is None:
+            vec = np.zeros(self.size)
+            for src in key:
+                self.accumulate(src, vec)
+            vec.flags.writeable = False
+            self._stimuli[key] = vec
+        return vec
+
+    def apply_stimulus(self, presynaptic: Iterable[str], values: np.ndarray, intensity: float = 1.0) -> None:
+        """values += intensity * stimulus_vector(presynaptic)."""
+        vec = self.stimulus_vector(presynaptic)
+        if intensity == 1.0:
+            values += vec
+        else:
+            values += intensity * vec
+
+    def propagate(self, fired: np.ndarray, edge_mask: Optional[np.ndarray] = None) -> np.ndarray:
+        """Fired-mask sparse matrix-vector product: summed input per target.
+
+        `edge_mask` optionally restricts the product to a subset of edges.
+        """
+        active = fired[self.edge_source]
+        if edge_mask is not None:
+            active &= edge_mask
+        return np.bincount(self.indices[active], weights=self.weights[active], minlength=self.size)
+
+
+def legacy_order_rank(size: int, random_mask: int) -> np.ndarray:
+    """Position of each neuron in run_connectome's XOR-masked visiting order."""
+    order = np.argsort(np.arange(size, dtype=np.int64) ^ int(random_mask))
+    rank = np.empty(size, dtype=np.int64)
+    rank[order] = np.arange(size, dtype=np.int64)
+    return rank
+
+
+def step(net: CompiledConnectome, this_state: np.ndarray, next_state: np.ndarray,
+         previous_value: np.ndarray, decroissance: np.ndarray, rank: Optional[np.ndarray],
+         threshold: float, neg_threshold: float, hyperpolarisation: float) -> np.ndarray:
+    """One run_connectome() step on state arrays (updated in place).
+
+    Legacy ordering (`rank` given): `rank` is the visiting order of the
+    sequential loop.  A firing neuron's input reaches a target either before
+    the target is visited (it is then decayed, counted by the growth test and
+    erased if the target fires) or after (added raw).  Splitting the edges on
+    rank[src] < rank[dst] gives the sequential result (up to floating-point
+    summation order) with two sparse products.  Self-synapses only deliver
+    when their neuron fires, which resets it, so they drop out.
+
+    Synchronous mode (`rank` is None): the fired set is taken from the
+    thisState snapshot, every neuron is decayed / reset / clamped first, then
+    all firings are delivered at once (self-synapses included).  The result
+    does not depend on any visiting order, so it is fully deterministic.
+
+    Returns the fired mask.
+    """
+    fired = (this_state >= threshold) & net.can_fire
+    if rank is None:
+        integrate(this_state, next_state, previous_value, decroissance, fired, 0.0, net.propagate(fired),
+                  threshold, neg_threshold, hyperpolarisation)
+        return fired
+    src_rank = rank[net.edge_source]
+    dst_rank = rank[net.indices]
+    early_input = net.propagate(fired, src_rank < dst_rank)
+    late_input = net.propagate(fired, src_rank > dst_rank)
+    integrate(this_state, next_state, previous_value, decroissance, fired, early_input, late_input,
+              threshold, neg_threshold, hyperpolarisation)
+    return fired
+
+
+def decay_table(size: int) -> np.ndarray:
+    """Decay factors for decroissance 0 .. size - 1 (at least), cached.
+
+    Same expression as the per-element formula, so looking a factor up is
+    bit-identical to computing it.
+    """
+    global _decay_table
+    if len(_decay_table) < size:
+        count = max(size, min(2 * len(_decay_table), DECAY_TABLE_MAX), 1024)
+        _decay_table = 1.0 - DECAY_K / (np.arange(count, dtype=np.float64) + 1 + DECAY_OFFSET)
+    return _decay_table
+
+
+class IntegrateBuffers:
+    """Scratch arrays of integrate() for one state shape, reused across steps."""
+
+    def __init__(self, shape):
+        self.mask = np.empty(shape, dtype=bool)
+        self.other_mask = np.empty(shape, dtype=bool)
+        self.factor = np.empty(shape)
+
+
+def integrate(this_state: np.ndarray, next_state: np.ndarray, previous_value: np.ndarray,
+              decroissance: np.ndarray, fired: np.ndarray, early_input, late_input,
+              threshold: float, neg_threshold: float, hyperpolarisation: float,
+              buffers: Optional[IntegrateBuffers] = None) -> None:
+    """Decay, reset and clamp part of a step (elementwise, updated in place).
+
+    Works on a single worm (n,) or an ensemble (n_worms, n) alike.
+    `early_input` is added before the decay, `late_input` after (either may
+    be the scalar 0).  `decroissance` may be an integer array, which saves
+    the cast before the decay table lookup; `buffers` avoids allocating
+    temporaries (large ensembles).
+
+    Masked writes (putmask / copyto where=) are slow on large arrays, so
+    the resets are multiplications by a mask and the few neurons at or
+    above threshold are handled by index; the results are the same.
+    """
+    if buffers is None:
+        buffers = IntegrateBuffers(this_state.shape)
+    mask = buffers.mask
+    if not np.isscalar(early_input) or early_input:
+        next_state += early_input
+
+    # Inverse decay (always applied; prevents runaway growth).  decroissance
+    # counts the steps since the state last grew.
+    np.less_equal(next_state, this_state, out=mask)
+    decroissance += 1
+    decroissance *= mask
+    top = int(decroissance.max(initial=0))
+    if top < DECAY_TABLE_MAX:
+        index = decroissance if decroissance.dtype.kind in 'iu' else decroissance.astype(np.intp)
+        np.take(decay_table(top + 1), index, out=buffers.factor, mode='clip')
+    else:
+        np.add(decroissance, 1 + DECAY_OFFSET, out=buffers.factor)
+        np.divide(DECAY_K, buffers.factor, out=buffers.factor)
+        np.subtract(1.0, buffers.factor, out=buffers.factor)
+    next_state *= buffers.factor
+    np.maximum(next_state, 0, out=next_state)
+
+    np.logical_not(fired, out=mask)
+    next_state *= mask  # NegthresholdHyperpolarisation
+
+    # PreviousValue follows thisState while it is below threshold
+    np.greater_equal(this_state, threshold, out=mask)
+    above = np.flatnonzero(mask)
+    flat = previous_value.reshape(-1) if previous_value.flags.c_contiguous else previous_value.flat
+    kept = flat[above]
+    np.copyto(previous_value, this_state)
+    flat[above] = kept
+
+    if neg_threshold > 0:  # otherwise already >= 0
+        np.maximum(next_state, neg_threshold, out=next_state)
+    if not np.isscalar(late_input) or late_input:
+        next_state += late_input
+
+    # below neg_threshold -> neg_threshold, except the hyperpolarisation value
+    if hyperpolarisation >= neg_threshold:  # then it is never below
+        np.maximum(next_state, neg_threshold, out=next_state)
+    else:
+        np.less(next_state, neg_threshold, out=mask)
+        np.not_equal(next_state, hyperpolarisation, out=buffers.other_mask)
+        mask &= buffers.other_mask
+        np.putmask(next_state, mask, neg_threshold)
+    np.copyto(this_state, next_state)
@@ -0,0 +1,278 @@
+"""ensemble.py
+
+Batched multi-worm engine: N independent worms stepped as one 2D array.
+
+Every worm shares the compiled connectome but owns its own state row, so the
+state columns are (n_worms, n_neurons) arrays.  They are stored neuron-major
+(the transposes of C-contiguous (n_neurons, n_worms) arrays), which is the
+layout the synaptic product reads and writes.  A step is:
+- forced neurons and per-worm stimuli (sensor target columns only),
+- optional gap-junction coupling through GapJunctionSymmetric.coupling on
+  the whole (n_worms, n) batch (explicit, substep or implicit integrator),
+- one sparse-dense product [W_early | W_late]^T (2n x n) @ fired^T
+  (n x n_worms), or W^T in synchronous mode,
+- the decay / threshold / clamp logic of run_connectome, vectorized
+  (connectome_csr.integrate, with preallocated buffers and an integer
+  decroissance for the decay table lookup),
+- the analog muscle model (muscle_layout.MuscleLayout, shared with
+  SimulationCore), motor control and triangle kinematics, vectorized
+  across worms.
+
+Update modes (see connectome_csr.step):
+- 'legacy': like run_connectome, each step draws one XOR mask and splits
+  every synapse into "arrives before / after its target is visited".  The
+  mask is shared by all worms of a step: each worm follows the legacy
+  dynamics, but the worms of a step see the same visiting order.  This is
+  a deliberate approximation (one order per worm means one matrix per
+  worm, which costs more than the rest of the step); a 1-worm ensemble
+  reproduces SimulationCore for the same random stream.
+- 'synchronous': all decays, then all firings; the product is against the
+  plain connectome matrix W, built once.
+
+scipy.sparse is used for the product when available; otherwise a dense
+(2n x n) matrix is used, which is fine for connectomes of a few hundred
+neurons.
+"""
+
+from __future__ import annotations
+
+import copy
+import random
+from typing import Iterable, Optional, Sequence
+
+import numpy as np
+
+import connectome
+import connectome_csr
+import gap_junction
+from connectome_csr import CompiledConnectome
+from muscle_layout import MuscleLayout
+from simulation_core import FOOD_SENSORS, TOUCH_SENSORS
+
+_sparse = None
+_import_error = None
+
+try:
+    import scipy.sparse as _sparse  # type: ignore
+except Exception as e:
+    _sparse = None
+    _import_error = e
+
+
+def scipy_available() -> bool:
+    return _sparse is not None
+
+
+class EnsembleEngine:
+    # Analog muscle model defaults (same as SimulationCore)
+    muscle_input_gain = 0.08
+    muscle_relaxation = 0.12
+    muscle_inhibition_gain = 0.20
+    muscle_max_activation = 100.0
+    muscle_neighbor_coupling = 0.10
+
+    triangle_speed = 4
+
+    def __init__(self, net: CompiledConnectome, n_worms: int, *, width: int = 1920, height: int = 1080,
+                 mode: str = 'legacy', seed=None, rng: Optional[random.Random] = None):
+        self.net = net
+        self.n_worms = int(n_worms)
+        self.mode = mode
+        self.threshold = float(connectome.threshold)
+        self.neg_threshold = float(connectome.Negthreshold)
+        self.hyperpolarisation = float(connectome.NegthresholdHyperpolarisation)
+        self.rng = rng or random.Random(seed)
+        self.iteration = 0
+
+        # (n_worms, n) views of neuron-major arrays
+        shape = (net.size, self.n_worms)
+        self.this_state = np.zeros(shape).T
+        self.next_state = np.zeros(shape).T
+        self.previous_value = np.zeros(shape).T
+        self.decroissance = np.zeros(shape, dtype=np.int32).T
+        self.forced = np.zeros(shape, dtype=bool).T
+        self.fired = np.zeros(shape, dtype=bool).T
+        self._forced_index = np.zeros(0, dtype=np.int64)
+
+        self.muscle_layout = MuscleLayout.from_names(net.names)
+        self.muscle_activation = np.zeros((self.muscle_layout.size, self.n_worms)).T
+        self.accumleft = np.zeros(self.n_worms)
+        self.accumright = np.zeros(self.n_worms)
+
+        self.triangle_pos = np.tile([width // 2, height // 2], (self.n_worms, 1)).astype(np.float64)
+        self.triangle_angle = np.zeros(self.n_worms)
+
+        self.gap_model = None
+        self.gap_gain = 0.01
+        self.gap_integrator = 'explicit'
+
+        self._buffers = connectome_csr.IntegrateBuffers(shape)
+        self._fired_input = np.zeros(shape)
+        self._dense = None
+        self._matrix = None
+        # self-synapses never deliver in legacy mode (see connectome_csr.step)
+        self._legacy_weights = np.where(net.edge_source == net.indices, 0.0, net.weights)
+
+    # ------------------------------------------------------------------
+    # Setup
+    # ------------------------------------------------------------------
+    def _worm_rows(self, worms) -> np.ndarray:
+        if worms is None:
+            return np.arange(self.n_worms)
+        return np.atleast_1d(np.asarray(worms))
+
+    def randomize(self, lo: float, hi: float, worms=None, neurons: Optional[Sequence[str]] = None,
+                  np_rng: Optional[np.random.Generator] = None) -> None:
+        """Vectorized trigger_random_initialization() for a subset of worms."""
+        np_rng = np_rng or np.random.default_rng(self.rng.getrandbits(64))
+        rows = self._worm_rows(worms)
+        cols = np.arange(self.net.size) if neurons is None else np.array(
+            [self.net.index[n] for n in neurons if n in self.net.index], dtype=np.int64)
+        values = np_rng.uniform(lo, hi, size=(rows.size, cols.size)) if abs(hi - lo) >= 1e-12 \
+            else np.full((rows.size, cols.size), float(lo))
+        sel = np.ix_(rows, cols)
+        self.this_state[sel] = values
+        self.next_state[sel] = values
+        self.previous_value[sel] = values
+        self.decroissance[sel] = 0.0
+        self.muscle_activation[rows] = 0.0
+
+    def set_forced(self, names: Iterable[str], worms=None, active: bool = True) -> None:
+        cols = [self.net.index[n] for n in names if n in self.net.index]
+        self.forced[np.ix_(self._worm_rows(worms), cols)] = active
+        self._forced_index = np.flatnonzero(self.forced.T)
+
+    def stimulate(self, presynaptic: Iterable[str], worms=None, gain=1.0) -> None:
+        """dendrite_accumulate() of the given neurons on the selected worms.
+
+        `gain` is a scalar or one intensity per selected worm; the sensor
+        group is compiled once into a stimulus vector (see
+        CompiledConnectome.stimulus_vector).
+        """
+        vec = self.net.stimulus_vector(presynaptic)
+        cols = np.flatnonzero(vec)
+        gain = np.asarray(gain, dtype=np.float64)
+        if gain.ndim:
+            gain = gain[:, None]
+        sel = (slice(None), cols) if worms is None else np.ix_(self._worm_rows(worms), cols)
+        self.next_state[sel] += gain * vec[cols]
+
+    def stimulate_food(self, worms=None, intensity=1.0) -> None:
+        self.stimulate(FOOD_SENSORS, worms, intensity)
+
+    def stimulate_touch(self, worms=None, intensity=1.0) -> None:
+        self.stimulate(TOUCH_SENSORS, worms, intensity)
+
+    def set_gap_model(self, gap_model, gain: Optional[float] = None, integrator: Optional[str] = None) -> None:
+        """Couple every worm through a GapJunctionSymmetric (None disables).
+
+        The model is shallow-copied and compiled over this engine's neuron
+        order, so it can stay shared with a SimulationCore.
+        """
+        if integrator is not None and integrator not in gap_junction.INTEGRATORS:
+            raise ValueError(f"unknown gap integrator {integrator!r} (expected one of {gap_junction.INTEGRATORS})")
+        if gap_model is not None:
+            gap_model = copy.copy(gap_model)
+            gap_model._cache = {}
+            gap_model.compile(self.net.names)
+        self.gap_model = gap_model
+        if gain is not None:
+            self.gap_gain = gain
+        if integrator is not None:
+            self.gap_integrator = integrator
+
+    # ------------------------------------------------------------------
+    # Step
+    # ------------------------------------------------------------------
+    def _split_matrix(self, rank: np.ndarray):
+        """[W_early | W_late]^T for this step's visiting order, shape (2n, n)."""
+        net = self.net
+        n = net.size
+        late = rank[net.edge_source] > rank[net.indices]
+        rows = net.indices + n * late
+        if _sparse is not None:
+            # the CSR arrays of W read as CSC are those of its transpose
+            return _sparse.csc_matrix((self._legacy_weights, rows, net.indptr), shape=(2 * n, n))
+        if self._dense is None:
+            self._dense = np.zeros((2 * n, n))
+        else:
+            self._dense[:] = 0.0
+        self._dense[rows, net.edge_source] = self._legacy_weights
+        return self._dense
+
+    def _plain_matrix(self):
+        """W^T (n x n), built once for synchronous mode."""
+        if self._matrix is None:
+            net = self.net
+            n = net.size
+            if _sparse is not None:
+                self._matrix = _sparse.csc_matrix((net.weights, net.indices, net.indptr), shape=(n, n))
+            else:
+                self._matrix = np.zeros((n, n))
+                np.add.at(self._matrix, (net.indices, net.edge_source), net.weights)
+        return self._matrix
+
+    def step(self) -> None:
+        n = self.net.size
+        # neuron-major (n, n_worms) arrays
+        this_state, next_state, fired = self.this_state.T, self.next_state.T, self.fired.T
+        if self._forced_index.size:
+            this_state.flat[self._forced_index] = self.threshold
+            next_state.flat[self._forced_index] = self.threshold
+        if self.gap_model is not None:
+            self.next_state += self.gap_model.coupling(self.this_state, self.gap_gain, integrator=self.gap_integrator)
+
+        np.greater_equal(this_state, self.threshold, out=fired)
+        fired &= self.net.can_fire[:, None]
+        np.copyto(self._fired_input, fired)
+        if self.mode == 'synchronous':
+            early_input = 0.0
+            late_input = np.asarray(self._plain_matrix() @ self._fired_input)
+        else:
+            rank = connectome_csr.legacy_order_rank(n, self.rng.randint(0, 0xFFFFFFFF))
+            inputs = np.asarray(self._split_matrix(rank) @ self._fired_input)
+            early_input, late_input = inputs[:n], inputs[n:]
+
+        connectome_csr.integrate(this_state, next_state, self.previous_value.T, self.decroissance.T,
+                                 fired, early_input, late_input,
+                                 self.threshold, self.neg_threshold, self.hyperpolarisation, self._buffers)
+        self.update_analog_muscles()
+        self.motorcontrol()
+        self.iteration += 1
+
+    def run(self, steps: int) -> None:
+        for _ in range(int(steps)):
+            self.step()
+
+    # ------------------------------------------------------------------
+    # Muscles / motor control (vectorized SimulationCore equivalents)
+    # ------------------------------------------------------------------
+    def update_analog_muscles(self) -> None:
+        self.muscle_layout.update(self.muscle_activation, self.this_state,
+                                  self.muscle_input_gain, self.muscle_relaxation, self.muscle_inhibition_gain,
+                                  self.muscle_max_activation, self.muscle_neighbor_coupling)
+
+    def body_segments(self):
+        """(length_factor, curvature_offset, contraction), each (n_worms, 17)."""
+        return self.muscle_layout.segments(self.muscle_activation, self.muscle_max_activation)
+
+    def motor_drives(self) -> np.ndarray:
+        """Left / right drive of every worm, shape (n_worms, 2)."""
+        return self.muscle_layout.side_drives(self.muscle_activation)
+
+    def motorcontrol(self) -> None:
+        drives = self.motor_drives()
+        self.accumleft, self.accumright = drives[:, 0], drives[:, 1]
+        left, right = self.accumleft, self.accumright
+
+        stopped = (left == 0) & (right == 0)
+        back = ~stopped & (right <= 0) & (left < 0)
+        turn_right = ~stopped & ~back & (right <= 0) & (left >= 0)
+        turn_left = ~stopped & ~back & ~turn_right & (right >= 0) & (left <= 0)
+        fwd = ~stopped & ~back & ~turn_right & ~turn_left & (right >= 0) & (left > 0)
+
+        self.triangle_angle += np.where(back | turn_left, -5, 0) + np.where(turn_right | fwd, 5, 0)
+        direction = np.where(fwd, 1.0, 0.0) - np.where(back, 1.0, 0.0)
+        rad = np.radians(self.triangle_angle)
+        self.triangle_pos[:, 0] += direction * self.triangle_speed * np.cos(rad)
+        self.triangle_pos[:, 1] += direction * self.triangle_speed * np.sin(rad)
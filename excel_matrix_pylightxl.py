@@ -10,6 +10,7 @@ from __future__ import annotations
 
 VERSION = 'autodetect-v1'
 
+import re
 from typing import Dict, List, Tuple, Optional
 
 _xl = None
@@ -60,6 +61,38 @@ def list_sheets(xlsx_path: str) -> List[str]:
     return list(db.ws_names)
 
 
+def find_sheet(sheets, *, must_contain):
+    """Find the first sheet whose *word tokens* contain all required tokens.
+
+    Important: avoids the classic trap where 'asymmetric' contains 'symmetric' as a substring.
+    We tokenize sheet names into alphanum words, then match tokens on words.
+    """
+    want = [t.lower() for t in must_contain]
+    for s in sheets:
+        low = s.lower()
+        words = re.findall(r"[a-z0-9]+", low)
+        if all(t in words for t in want):
+            return s
+    return None
+
+
+def build_models(sheets):
+    """Build model presets from SI7-like workbook sheet names."""
+    models = []
+    # canonical names used in your SI7 file
+    candidates = [
+        ("Hermaphrodite", "herm"),
+        ("Male", "male"),
+        ("Juvenile", "juvenile"),
+    ]
+    for label, prefix in candidates:
+        chem = find_sheet(sheets, must_contain=[prefix, "chem", "grouped"])
+        gap = find_sheet(sheets, must_contain=[prefix, "gap", "jn", "grouped", "symmetric"])
+        if chem:
+            models.append({"name": label, "key": prefix, "chem": chem, "gap": gap or ""})
+    return models
+
+
 def _is_text(v) -> bool:
     if v is None:
         return False
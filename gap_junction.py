@@ -1,11 +1,66 @@
 from __future__ import annotations
-from dataclasses import dataclass
-from typing import Dict, List, Tuple
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+import math
+
+import numpy as np
+
+_sparse = None
+_splu = None
+_import_error = None
+
+try:
+    import scipy.sparse as _sparse  # type: ignore
+    from scipy.sparse.linalg import splu as _splu  # type: ignore
+except Exception as e:
+    _sparse = None
+    _splu = None
+    _import_error = e
+
+# Integrators for the gap step (see GapJunctionSymmetric.coupling)
+INTEGRATORS = ("explicit", "substep", "implicit")
+
+# Largest per-edge gain of the legacy explicit update, and the per-substep
+# bound on a neuron's total coupling (keeps every substep monotone)
+EXPLICIT_GAIN_CLAMP = 0.45
+SUBSTEP_MAX_COUPLING = 0.5
+
 
 @dataclass
 class GapJunctionSymmetric:
+    """Symmetric (electrical) coupling: each pair (a, b) with conductance g
+    moves next[a] += k * (this[b] - this[a]) and next[b] -= the same flow.
+
+    The pairs are also kept as endpoint arrays (pair_a < pair_b by name, one
+    entry per junction).  Once bound to a neuron order (compile()), the
+    per-edge gains k and the weighted graph Laplacian L are computed once per
+    (gain, dt, normalize_by_degree) and a step is a single
+    Laplacian-times-voltage product.
+
+    Integrators:
+    - 'explicit': forward Euler, delta = -L v, with every k clamped to 0.45
+      (the historical behaviour; stable but distorts large gains).
+    - 'substep': forward Euler on the unclamped L, split into as many
+      substeps as needed for each one to be monotone (the count grows
+      with the gain; prefer 'implicit' for very strong coupling).
+    - 'implicit': backward Euler, delta = (I + L)^-1 v - v, unconditionally
+      stable; the factorisation (scipy splu, or a dense inverse without
+      scipy) is cached per gain.
+    """
     adj: Dict[str, List[Tuple[str, float]]]
     deg: Dict[str, float]
+    pair_a: List[str] = field(default_factory=list)
+    pair_b: List[str] = field(default_factory=list)
+    pair_g: np.ndarray = field(default_factory=lambda: np.zeros(0))
+
+    # Compiled over a neuron order (see compile()); not part of the model
+    names: Optional[List[str]] = field(default=None, init=False, repr=False)
+    src: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=np.int64), init=False, repr=False)
+    dst: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=np.int64), init=False, repr=False)
+    g: np.ndarray = field(default_factory=lambda: np.zeros(0), init=False, repr=False)
+    _degree_norm: np.ndarray = field(default_factory=lambda: np.zeros(0), init=False, repr=False)
+    _bound_to: Optional[Tuple[int, int]] = field(default=None, init=False, repr=False)
+    _cache: Dict[tuple, object] = field(default_factory=dict, init=False, repr=False)
 
     @classmethod
     def from_excel_connectome(cls, excel_connectome):
@@ -24,9 +79,128 @@ class GapJunctionSymmetric:
             adj.setdefault(y, []).append((x, g))
             deg[x] = deg.get(x, 0.0) + g
             deg[y] = deg.get(y, 0.0) + g
-        return cls(adj=adj, deg=deg)
+        return cls(adj=adj, deg=deg,
+                   pair_a=[x for x, _ in pair_g], pair_b=[y for _, y in pair_g],
+                   pair_g=np.fromiter(pair_g.values(), dtype=np.float64, count=len(pair_g)))
+
+    # ------------------------------------------------------------------
+    # Compiled form
+    # ------------------------------------------------------------------
+    def compile(self, names: Sequence[str]) -> None:
+        """Bind the junctions to a neuron order (pairs with a missing end are dropped)."""
+        index = {n: i for i, n in enumerate(names)}
+        keep = [k for k, (a, b) in enumerate(zip(self.pair_a, self.pair_b)) if a in index and b in index]
+        self.names = list(names)
+        self.src = np.array([index[self.pair_a[k]] for k in keep], dtype=np.int64)
+        self.dst = np.array([index[self.pair_b[k]] for k in keep], dtype=np.int64)
+        self.g = self.pair_g[keep] if keep else np.zeros(0)
+        da = np.array([max(self.deg.get(self.pair_a[k], 1.0), 1.0) for k in keep])
+        db = np.array([max(self.deg.get(self.pair_b[k], 1.0), 1.0) for k in keep])
+        self._degree_norm = 2.0 / (da + db) if keep else np.zeros(0)
+        self._bound_to = None
+        self._cache.clear()
+
+    def _bind(self, postsynaptic) -> None:
+        # Recompile only when the store's name list changed
+        key = (id(postsynaptic), postsynaptic.version)
+        if self._bound_to != key:
+            self.compile(postsynaptic.names)
+            self._bound_to = key
+
+    def _cached(self, key, build):
+        value = self._cache.get(key)
+        if value is None:
+            value = build()
+            self._cache[key] = value
+        return value
+
+    def edge_gains(self, gain=0.08, dt=1.0, normalize_by_degree=True, clamp=True) -> np.ndarray:
+        """Per-junction coupling k, cached per gain setting (clamped to 0.45 by default)."""
+        def build():
+            k = gain * dt * self.g
+            if normalize_by_degree:
+                k = k * self._degree_norm
+            return np.minimum(k, EXPLICIT_GAIN_CLAMP) if clamp else k
+        return self._cached(("gains", float(gain), float(dt), bool(normalize_by_degree), bool(clamp)), build)
+
+    def laplacian(self, gain=0.08, dt=1.0, normalize_by_degree=True, clamp=True) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(rows, cols, data) of -L, so that delta = (-L) @ voltage."""
+        def build():
+            k = self.edge_gains(gain, dt, normalize_by_degree, clamp)
+            src, dst = self.src, self.dst
+            rows = np.concatenate([src, dst, src, dst])
+            cols = np.concatenate([dst, src, src, dst])
+            data = np.concatenate([k, k, -k, -k])
+            return rows, cols, data
+        return self._cached(("laplacian", float(gain), float(dt), bool(normalize_by_degree), bool(clamp)), build)
+
+    def _matrix(self, rows, cols, data):
+        n = len(self.names)
+        if _sparse is not None:
+            return _sparse.csr_matrix((data, (rows, cols)), shape=(n, n))
+        m = np.zeros((n, n))
+        np.add.at(m, (rows, cols), data)
+        return m
+
+    def _substep_operator(self, gain, dt, normalize_by_degree):
+        """(-L / m, m): m substeps, each with a total coupling <= 0.5 per neuron."""
+        def build():
+            rows, cols, data = self.laplacian(gain, dt, normalize_by_degree, clamp=False)
+            k = self.edge_gains(gain, dt, normalize_by_degree, clamp=False)
+            n = len(self.names)
+            strength = np.bincount(self.src, k, minlength=n) + np.bincount(self.dst, k, minlength=n)
+            m = max(1, math.ceil(float(strength.max(initial=0.0)) / SUBSTEP_MAX_COUPLING))
+            return self._matrix(rows, cols, data / m), m
+        return self._cached(("substep", float(gain), float(dt), bool(normalize_by_degree)), build)
+
+    def _implicit_operator(self, gain, dt, normalize_by_degree):
+        """Factorised (I + L): a solve(b) callable (splu, or a dense inverse)."""
+        def build():
+            rows, cols, data = self.laplacian(gain, dt, normalize_by_degree, clamp=False)
+            n = len(self.names)
+            if _sparse is not None:
+                a = _sparse.identity(n, format="csc") - _sparse.csc_matrix((data, (rows, cols)), shape=(n, n))
+                return _splu(a).solve
+            a = np.eye(n)
+            np.add.at(a, (rows, cols), -data)
+            inverse = np.linalg.inv(a)
+            return lambda b: inverse @ b
+        return self._cached(("implicit", float(gain), float(dt), bool(normalize_by_degree)), build)
+
+    def coupling(self, voltage: np.ndarray, gain=0.08, dt=1.0, normalize_by_degree=True,
+                 integrator="explicit") -> np.ndarray:
+        """Gap-junction input per neuron for a voltage vector (n,) or batch (n_worms, n)."""
+        if integrator == "implicit":
+            solve = self._implicit_operator(gain, dt, normalize_by_degree)
+            return solve(voltage.T).T - voltage
+        if integrator == "substep":
+            step, m = self._substep_operator(gain, dt, normalize_by_degree)
+            v = np.array(voltage, dtype=np.float64)
+            for _ in range(m):
+                v += np.asarray(v @ step)  # -L is symmetric
+            return v - voltage
+        if integrator != "explicit":
+            raise ValueError(f"unknown gap integrator {integrator!r} (expected one of {INTEGRATORS})")
+        rows, cols, data = self.laplacian(gain, dt, normalize_by_degree)
+        if voltage.ndim == 1:
+            return np.bincount(rows, weights=data * voltage[cols], minlength=voltage.shape[0])
+        return np.asarray(voltage @ self._cached(("explicit", float(gain), float(dt), bool(normalize_by_degree)),
+                                                 lambda: self._matrix(rows, cols, data)))
+
+    # ------------------------------------------------------------------
+    # Step
+    # ------------------------------------------------------------------
+    def apply_step(self, postsynaptic, this_idx, next_idx, gain=0.08, dt=1.0, normalize_by_degree=True,
+                   integrator="explicit"):
+        if hasattr(postsynaptic, "column"):
+            # NeuronStateStore: one Laplacian product (or solve) on the column arrays
+            self._bind(postsynaptic)
+            next_state = postsynaptic.column(next_idx)
+            next_state += self.coupling(postsynaptic.column(this_idx), gain, dt, normalize_by_degree, integrator)
+            return
+        if integrator != "explicit":
+            raise ValueError("the substep / implicit gap integrators need a NeuronStateStore")
 
-    def apply_step(self, postsynaptic, this_idx, next_idx, gain=0.08, dt=1.0, normalize_by_degree=True):
         processed = set()
         delta = {}
 
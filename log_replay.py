@@ -0,0 +1,82 @@
+"""log_replay.py
+
+Random access to recorded runs (sim_logger binary logs) for replay.
+
+The log is memory-mapped, so opening a multi-GB run costs nothing and only
+the frames actually shown are read from disk:
+- dense logs: frame k is row k;
+- sparse logs: frame k is its step's entries (located by the per-step
+  index) or its dense frame;
+- delta logs: a full state checkpoint is kept every `checkpoint_every`
+  frames (built by one streaming pass, on first use), so any frame is its
+  checkpoint plus at most that many frames of changes.
+
+SimulationCore.start_replay() feeds these frames into postsynaptic instead
+of running the connectome, so every screen works unchanged.
+"""
+
+from __future__ import annotations
+
+from typing import List, Optional
+
+import numpy as np
+
+from sim_logger import EntryLog, read_log, read_manifest
+
+
+class LogReplay:
+    def __init__(self, path: str, checkpoint_every: int = 1024):
+        self.path = path
+        self.manifest = read_manifest(path)
+        self.names: List[str] = list(self.manifest["names"])
+        self.mode = self.manifest.get("mode", "dense")
+        self.metadata = self.manifest.get("metadata", {})
+        if self.mode == "dense":
+            self.records = read_log(path)
+            self.log = None
+            self.iterations = np.asarray(self.records["iteration"])
+        else:
+            self.records = None
+            self.log = EntryLog(path, self.manifest)
+            self.iterations = self.log.iterations
+        self.position = -1  # last frame loaded
+        self.checkpoint_every = max(1, int(checkpoint_every))
+        self._checkpoints: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.iterations)
+
+    def iteration_at(self, k: int) -> int:
+        return int(self.iterations[k])
+
+    def frame(self, k: int) -> np.ndarray:
+        """State vector (float32, aligned with `names`) of logged frame k."""
+        if not 0 <= k < len(self):
+            raise IndexError(f"frame {k} out of range (0..{len(self) - 1})")
+        if self.mode == "dense":
+            return np.array(self.records["state"][k])
+
+        state = np.zeros(len(self.names), dtype=np.float32)
+        if self.mode == "sparse":
+            self.log.step(k, state)
+            return state
+
+        self._ensure_checkpoints()
+        c = k // self.checkpoint_every
+        state[:] = self._checkpoints[c]
+        self.log.advance(state, c * self.checkpoint_every, k + 1)
+        return state
+
+    def _ensure_checkpoints(self) -> None:
+        # checkpoint c = state just before frame c * checkpoint_every
+        if self._checkpoints is not None:
+            return
+        starts = range(0, len(self), self.checkpoint_every)
+        checkpoints = np.zeros((len(starts), len(self.names)), dtype=np.float32)
+        current = np.zeros(len(self.names), dtype=np.float32)
+        previous = 0
+        for c, start in enumerate(starts):
+            self.log.advance(current, previous, start)
+            checkpoints[c] = current
+            previous = start
+        self._checkpoints = checkpoints
@@ -0,0 +1,135 @@
+"""muscle_layout.py
+
+Precomputed muscle topology and the vectorized analog muscle pipeline.
+
+The body-wall muscles are found once per network (names whose 3-letter
+prefix is in connectome.muscles) and laid out as index arrays:
+- `index`: neuron IDs of the muscles (postsynaptic order),
+- the four longitudinal chains MDL/MDR/MVL/MVR 07..23 as a (4, 17) grid of
+  muscle positions (-1 where a muscle is missing), giving each muscle its
+  previous / next neighbour for the smoothing stencil,
+- left / right masks used by motor control, and the same as an (m, 2)
+  reduction matrix so both drives come out of one product.
+
+Every function works on a single worm (m,) or a batch (n_worms, m), so
+SimulationCore and EnsembleEngine share the same code.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+import connectome
+
+CHAIN_SIDES = ("MDL", "MDR", "MVL", "MVR")
+FIRST_SEGMENT = 7
+NUM_SEGMENTS = 17
+
+# Body schematic (update_worm_movement)
+CONTRACTION_SCALE = 0.55
+MAX_CURVATURE_OFFSET = 24.0
+
+
+@dataclass
+class MuscleLayout:
+    names: List[str]        # muscle names, postsynaptic order
+    index: np.ndarray       # int64 neuron IDs of the muscles
+    chains: np.ndarray      # (4, NUM_SEGMENTS) muscle positions, -1 = missing
+    position: Dict[str, int] = field(init=False)
+    prev_neighbor: np.ndarray = field(init=False)
+    next_neighbor: np.ndarray = field(init=False)
+    left_mask: np.ndarray = field(init=False)
+    right_mask: np.ndarray = field(init=False)
+    side_matrix: np.ndarray = field(init=False)  # (m, 2): columns = left, right
+
+    def __post_init__(self):
+        self.position = {n: j for j, n in enumerate(self.names)}
+        m = len(self.names)
+        self.prev_neighbor = np.full(m, -1, dtype=np.int64)
+        self.next_neighbor = np.full(m, -1, dtype=np.int64)
+        for chain in self.chains:
+            for k, j in enumerate(chain):
+                if j < 0:
+                    continue
+                if k > 0 and chain[k - 1] >= 0:
+                    self.prev_neighbor[j] = chain[k - 1]
+                if k + 1 < len(chain) and chain[k + 1] >= 0:
+                    self.next_neighbor[j] = chain[k + 1]
+        self._has_prev = self.prev_neighbor >= 0
+        self._has_next = self.next_neighbor >= 0
+        count = self._has_prev.astype(np.float64) + self._has_next
+        self._coupled = count > 0
+        self._count = np.maximum(count, 1.0)
+
+        left = set(connectome.musDleft) | set(connectome.musVleft)
+        right = set(connectome.musDright) | set(connectome.musVright)
+        self.left_mask = np.array([n in left for n in self.names], dtype=bool)
+        # motorcontrol tests left first (if / elif), so a muscle never counts twice
+        self.right_mask = np.array([n in right for n in self.names], dtype=bool) & ~self.left_mask
+        self.side_matrix = np.stack([self.left_mask, self.right_mask], axis=1).astype(np.float64)
+
+    @classmethod
+    def from_names(cls, neuron_names: Sequence[str]) -> "MuscleLayout":
+        index = [i for i, n in enumerate(neuron_names) if n[:3] in connectome.muscles]
+        names = [neuron_names[i] for i in index]
+        position = {n: j for j, n in enumerate(names)}
+        chains = np.array([[position.get(f"{side}{FIRST_SEGMENT + k:02d}", -1) for k in range(NUM_SEGMENTS)]
+                           for side in CHAIN_SIDES], dtype=np.int64)
+        return cls(names=names, index=np.asarray(index, dtype=np.int64), chains=chains)
+
+    @property
+    def size(self) -> int:
+        return len(self.names)
+
+    # ------------------------------------------------------------------
+    # Pipeline
+    # ------------------------------------------------------------------
+    def update(self, activation: np.ndarray, this_state: np.ndarray, input_gain: float, relaxation: float,
+               inhibition_gain: float, max_activation: float, neighbor_coupling: float) -> None:
+        """Integrate, relax, clamp and smooth `activation` in place.
+
+        `this_state` holds every neuron's state ((n,) or (n_worms, n)); the
+        muscle commands are gathered from it with `index`.
+        """
+        command = this_state[..., self.index]
+        # -inhibition_gain * |command| == inhibition_gain * command for command < 0
+        command *= np.where(command >= 0.0, input_gain, inhibition_gain)
+        activation += command
+        activation -= relaxation * activation
+        np.clip(activation, 0.0, max_activation, out=activation)
+
+        # small smoothing along each longitudinal chain to produce cleaner waves
+        # (activation >= 0 here, so multiplying by the 0 / 1 masks drops the missing neighbours exactly)
+        coupling = max(0.0, min(0.5, neighbor_coupling))
+        if coupling > 0.0:
+            total = activation[..., self.prev_neighbor] * self._has_prev
+            total += activation[..., self.next_neighbor] * self._has_next
+            total /= self._count
+            total -= activation
+            total *= coupling
+            total *= self._coupled
+            activation += total
+
+    def side_drives(self, activation: np.ndarray) -> np.ndarray:
+        """Summed left / right activation, shape (..., 2), as used by motor control."""
+        return activation @ self.side_matrix
+
+    def segments(self, activation: np.ndarray, saturation: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(length_factor, curvature_offset, contraction) per body segment."""
+        if self.size:
+            grid = np.where(self.chains >= 0, activation[..., self.chains], 0.0)  # (..., 4, NUM_SEGMENTS)
+        else:
+            grid = np.zeros(activation.shape[:-1] + self.chains.shape)
+        dorsal = (grid[..., 0, :] + grid[..., 1, :]) / 2.0
+        ventral = (grid[..., 2, :] + grid[..., 3, :]) / 2.0
+        saturation = saturation if saturation > 0 else 1.0
+        contraction = np.minimum(np.maximum(0.0, (dorsal + ventral) / 2.0) / saturation, 1.0)
+        # muscles shorten proportionally to activation, without neuronal thresholding
+        length_factor = 1.0 - contraction * (1.0 - CONTRACTION_SCALE)
+        # dorsal/ventral imbalance bends the body
+        curvature = np.clip(MAX_CURVATURE_OFFSET * ((dorsal - ventral) / saturation),
+                            -MAX_CURVATURE_OFFSET, MAX_CURVATURE_OFFSET)
+        return length_factor, curvature, contraction
@@ -7,6 +7,34 @@ Responsibilities:
 - Run the main loop (events, stepping the simulation, rendering).
 - Route keyboard/mouse events to the active screen module.
 
+Replay: `python nemabot.py --replay run.npy` drives every screen from a
+recorded binary log (see log_replay.py) instead of simulating.  While
+replaying, `,` / `.` step one frame, `[` / `]` jump 100 frames, Home / End
+go to the first / last frame and L returns to live simulation.
+
+Threaded: `python nemabot.py --threaded` steps the simulation on a worker
+thread (sim_worker.py) at iterations_per_second whatever the rendering
+cost; the neuron matrix draws the latest published snapshot, the other
+screens draw under sim.state_lock.
+
+Turbo (B key): instead of iterations_per_second, every frame spends
+sim.turbo_budget seconds stepping as fast as possible, then renders once;
+the achieved rate is shown top right.  `--turbo-budget MS` sets the budget
+(a longer one trades frame rate for steps/s).
+
+Profiler (F3): per-phase timings of the simulation step and of the main
+loop (events, stepping, screen draw, flip), with FPS and steps/s, in a
+HUD (screen_profiler.py).  `--headless --profile` prints the same step
+phases after a batch run.
+
+Headless: `python nemabot.py --headless --steps N [--network SPEC]
+[--seed S] [--stimulus food|touch|forced:NAMES] [--watch NAMES] [--log PATH]
+[--log-mode dense|sparse|delta] [--log-every N] [--log-tolerance X]`
+runs without a window, prints the throughput and exits (batch / CI runs);
+with --watch the log only records the watched neurons.  --log-mode,
+--log-every and --log-tolerance select what the log records (see
+sim_logger.py); the options screen sets the same for the windowed app.
+
 Menu UX:
 - After the splash screen, the default view is the mosaic menu
   (screen_menu.py).
@@ -16,18 +44,38 @@ Menu UX:
 """
 
 
-import pygame
-from simulator import Simulator
-import screen_menu
-import screen_help
-import screen_matrix
-import screen_curve   # Waves (courbes)
-import screen_wave    # Raster (déclenchementws)
-import screen_movement
-import screen_worm
-import screen_options
-import screen_excel_loader_pylightxl as screen_excel_loader
-import screen_forced_functions
+import argparse
+import contextlib
+import os
+import time
+
+import numpy as np
+from connectome import postsynaptic
+from sim_logger import LOG_MODES
+from simulation_core import DEFAULT_TURBO_BUDGET, SimulationCore
+
+# Longest backlog (seconds) the single-threaded loop catches up after a slow frame
+MAX_CATCHUP = 0.25
+
+def import_gui():
+    """Import pygame and the screens (the headless path never loads them)."""
+    global pygame, Simulator, SimulationWorker, screen_menu, screen_help, screen_matrix, screen_curve, \
+        screen_wave, screen_movement, screen_worm, screen_options, screen_excel_loader, \
+        screen_forced_functions, screen_profiler
+    import pygame
+    from simulator import Simulator
+    from sim_worker import SimulationWorker
+    import screen_menu
+    import screen_help
+    import screen_matrix
+    import screen_curve   # Waves (courbes)
+    import screen_wave    # Raster (déclenchementws)
+    import screen_movement
+    import screen_worm
+    import screen_options
+    import screen_excel_loader_pylightxl as screen_excel_loader
+    import screen_forced_functions
+    import screen_profiler
 
 def splash(sim):
     rect = sim.screen.get_rect()
@@ -47,63 +95,230 @@ def splash(sim):
                 waiting = False
                 pygame.event.post(pygame.event.Event(pygame.QUIT))
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Nemabot - C. elegans neural network simulator")
+    parser.add_argument("--replay", metavar="LOG.npy", help="replay a recorded binary log instead of simulating")
+    parser.add_argument("--threaded", action="store_true",
+                        help="step the simulation on a worker thread, independently of the frame rate")
+    parser.add_argument("--turbo-budget", type=float, default=DEFAULT_TURBO_BUDGET * 1000, metavar="MS",
+                        help=f"stepping time per frame in turbo mode (default: {DEFAULT_TURBO_BUDGET * 1000:g} ms)")
+    batch = parser.add_argument_group("headless batch runs")
+    batch.add_argument("--headless", action="store_true", help="run without a window and exit when done")
+    batch.add_argument("--steps", type=int, default=1000, help="iterations to run (default: 1000)")
+    batch.add_argument("--network", default="builtin", metavar="SPEC",
+                       help="'builtin' or 'xlsx:PATH:MODEL' (MODEL: herm, male, juvenile or 'CHEM|GAP' sheets)")
+    batch.add_argument("--seed", type=int, default=None, help="RNG seed (reproducible runs)")
+    batch.add_argument("--update-mode", choices=("legacy", "synchronous"), default="legacy")
+    batch.add_argument("--stimulus", action="append", default=[], metavar="KIND",
+                       help="food, touch or forced:NAME[,NAME...] (repeatable)")
+    batch.add_argument("--watch", action="append", default=[], metavar="NAMES",
+                       help="neurons to record, NAME[,NAME...] (repeatable); with --log, only these are logged")
+    batch.add_argument("--log", metavar="PATH", help="state log; .csv for CSV, anything else binary (.npy + .json)")
+    batch.add_argument("--log-mode", choices=LOG_MODES, default="dense",
+                       help="dense (every neuron), sparse (nonzero states) or delta (changes only); default: dense")
+    batch.add_argument("--log-every", type=int, default=1, metavar="N", help="log one step in N (default: 1)")
+    batch.add_argument("--log-tolerance", type=float, default=0.0, metavar="X",
+                       help="delta mode: only log changes larger than X (default: 0)")
+    batch.add_argument("--profile", action="store_true", help="print per-phase step timings at the end")
+    args = parser.parse_args(argv)
+    if args.headless and args.replay:
+        parser.error("--replay needs the window (drop --headless)")
+    if args.turbo_budget <= 0:
+        parser.error("--turbo-budget must be positive")
+    if args.log_every < 1:
+        parser.error("--log-every must be at least 1")
+    if args.log_tolerance < 0:
+        parser.error("--log-tolerance must not be negative")
+    return args
+
+def run_headless(args):
+    """Batch run: no window, no splash; prints a throughput summary."""
+    sim = SimulationCore(seed=args.seed)
+    sim.update_mode = args.update_mode
+    sim.log_format = None
+    try:
+        loaded = sim.load_network(args.network)
+    except Exception as e:  # bad spec, missing file / sheet, no pylightxl
+        raise SystemExit(f"--network: {e}")
+    if not loaded:
+        raise SystemExit(sim.excel_status)
+    try:
+        for stimulus in args.stimulus:
+            sim.add_stimulus(stimulus)
+    except ValueError as e:
+        raise SystemExit(f"--stimulus: {e}")
+    sim.start_simulation()
+    watch = [n.strip() for names in args.watch for n in names.split(",") if n.strip()]
+    unknown = [n for n in watch if n not in postsynaptic]
+    if unknown:
+        raise SystemExit(f"--watch: unknown neuron(s) {', '.join(unknown)}")
+    for name in watch:
+        sim.watch_neuron(name)
+    sim.log_watched_only = bool(watch)
+    sim.profiler.enabled = args.profile
+    sim.profiler.window = max(1, args.steps)
+    log_path = None
+    if args.log:
+        base, ext = os.path.splitext(args.log)
+        sim.log_format = 'csv' if ext.lower() == '.csv' else 'binary'
+        sim.log_mode = args.log_mode
+        sim.log_every = args.log_every
+        sim.log_tolerance = args.log_tolerance
+        # a batch run waits for the log writer rather than dropping chunks
+        log_path = sim.open_log(base, block=True)
+    logger = sim.logger
+
+    latency = np.empty(max(0, args.steps))
+    start = time.perf_counter()
+    for i in range(args.steps):
+        t = time.perf_counter()
+        sim.step_simulation()
+        latency[i] = time.perf_counter() - t
+    elapsed = time.perf_counter() - start
+    sim.shutdown()
+
+    print(f"network     {sim.network_description()} ({len(postsynaptic)} neurons)")
+    print(f"steps       {args.steps} in {elapsed:.3f} s -> {args.steps / max(elapsed, 1e-9):,.0f} steps/s")
+    if args.steps:
+        p50, p99 = np.percentile(latency, [50, 99]) * 1000
+        print(f"step time   p50 {p50:.3f} ms, p99 {p99:.3f} ms, max {latency.max() * 1000:.3f} ms")
+    print(f"iteration   {sim.iteration}, seed {sim.seed}, mode {sim.update_mode}")
+    if log_path:
+        print(f"log         {log_path} ({logger.dropped_records} dropped records)")
+    if args.profile:
+        print()
+        print(sim.profiler.report())
+    return 0
+
+def draw_status_overlay(sim, surface, rect):
+    """Replay / turbo status, top right.  Returns True if anything was drawn."""
+    lines = []
+    if sim.replay is not None:
+        replay = sim.replay
+        lines.append(f"REPLAY {replay.position + 1}/{len(replay)}  iteration {sim.iteration}")
+    if sim.turbo_mode:
+        lines.append(f"TURBO {sim.turbo_budget * 1000:.0f} ms/frame  {sim.steps_per_second:,.0f} it/s  iteration {sim.iteration}")
+    for i, text in enumerate(lines):
+        sim.draw_text(surface, text, rect.right - 20, rect.top + 10 + 26 * i, sim.colorsName['red'], font_size=24, align='right')
+    return bool(lines)
+
+def active_screen(sim):
+    """Screen module selected by the display_* flags."""
+    if sim.display_help_screen:
+        return screen_help
+    elif sim.display_menu_screen:
+        return screen_menu
+    elif sim.display_neuron_matrix:
+        return screen_matrix
+    elif sim.display_curve_screen:
+        return screen_curve
+    elif sim.display_wave_screen:
+        return screen_wave
+    elif sim.display_movement_screen:
+        return screen_movement
+    elif sim.display_worm_screen:
+        return screen_worm
+    elif sim.display_excel_loader_screen:
+        return screen_excel_loader
+    elif sim.display_forced_functions_screen:
+        return screen_forced_functions
+    elif sim.display_options_screen:
+        return screen_options
+    return screen_help
+
 def main():
+    args = parse_args()
+    if args.headless:
+        return run_headless(args)
+    import_gui()
     sim = Simulator()
+    sim.turbo_budget = args.turbo_budget / 1000.0
+    if args.replay:
+        print(sim.start_replay(args.replay))
     clock = pygame.time.Clock()
     splash(sim)
     sim.game_active = True
+    worker = None
+    if args.threaded:
+        with sim.state_lock:
+            if not sim.running:
+                sim.start_simulation()
+        worker = SimulationWorker(sim)
+        worker.start()
+    frame_profiler = sim.frame_profiler
     running = True
     while running:
         dt = clock.tick(60) / 1000.0
+        frame_profiler.start()  # the tick's sleep is not a phase
         sim.simulation_time_accumulator += dt
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
-            elif event.type == pygame.KEYDOWN:
-                handle_key(sim, event)
-            elif event.type == pygame.MOUSEBUTTONDOWN:
-                route_mouse(sim, event.pos, event.button)
-            elif event.type == pygame.TEXTINPUT:
-                if getattr(sim, 'display_excel_loader_screen', False):
-                    screen_excel_loader.handle_text(sim, event.text)
-
-        if not sim.running:
-            sim.start_simulation()
-
-        if sim.step_mode:
+        with sim.state_lock:  # the worker steps between frames, never during an event
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    running = False
+                elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                    sim.invalidate_display()
+                elif event.type == pygame.KEYDOWN:
+                    handle_key(sim, event)
+                elif event.type == pygame.MOUSEBUTTONDOWN:
+                    route_mouse(sim, event.pos, event.button)
+                elif event.type == pygame.TEXTINPUT:
+                    if getattr(sim, 'display_excel_loader_screen', False):
+                        screen_excel_loader.handle_text(sim, event.text)
+
+            if not sim.running:
+                sim.start_simulation()
+        frame_profiler.lap('events')
+
+        if worker is not None:
+            # the worker keeps its own pace; render the latest complete step
+            sim.render_snapshot = worker.snapshot()
+        elif sim.step_mode:
             if sim.step_ready:
                 sim.step_simulation()
                 sim.step_ready = False
+        elif sim.turbo_mode:
+            sim.run_for(sim.turbo_budget)
+            sim.simulation_time_accumulator = 0.0
         else:
             target = 1.0 / max(1, sim.iterations_per_second)
+            # a slow frame is not caught up beyond MAX_CATCHUP seconds
+            sim.simulation_time_accumulator = min(sim.simulation_time_accumulator, MAX_CATCHUP)
             while sim.simulation_time_accumulator >= target:
                 sim.step_simulation()
                 sim.simulation_time_accumulator -= target
 
+        frame_profiler.lap('simulation')
+
         rect = sim.screen.get_rect()
-        if sim.display_help_screen:
-            screen_help.draw(sim, sim.screen, rect)
-        elif sim.display_menu_screen:
-            screen_menu.draw(sim, sim.screen, rect)
-        elif sim.display_neuron_matrix:
-            screen_matrix.draw(sim, sim.screen, rect)
-        elif sim.display_curve_screen:
-            screen_curve.draw(sim, sim.screen, rect)
-        elif sim.display_wave_screen:
-            screen_wave.draw(sim, sim.screen, rect)
-        elif sim.display_movement_screen:
-            screen_movement.draw(sim, sim.screen, rect)
-        elif sim.display_worm_screen:
-            screen_worm.draw(sim, sim.screen, rect)
-        elif sim.display_excel_loader_screen:
-            screen_excel_loader.draw(sim, sim.screen, rect)
-        elif sim.display_forced_functions_screen:
-            screen_forced_functions.draw(sim, sim.screen, rect)
-        elif sim.display_options_screen:
-            screen_options.draw(sim, sim.screen, rect)
+        screen = active_screen(sim)
+        # only screen_matrix draws from the snapshot; the other screens read
+        # (screen_movement even moves) the live simulation, so the worker
+        # waits while they draw
+        threaded_draw = worker is not None and screen is not screen_matrix
+        with sim.state_lock if threaded_draw else contextlib.nullcontext():
+            # rects changed this frame, None = whole screen (only screen_matrix
+            # draws partial frames)
+            dirty = screen.draw(sim, sim.screen, rect)
+            frame_profiler.lap('draw ' + screen.__name__.replace('screen_', ''))
+        with sim.state_lock:
+            sim.update_step_rate()
+            if not sim.display_menu_screen and draw_status_overlay(sim, sim.screen, rect):
+                screen_matrix.invalidate(sim)
+                dirty = None
+            if sim.profiler.enabled:
+                screen_profiler.draw(sim, sim.screen, rect, clock.get_fps())
+                screen_matrix.invalidate(sim)
+                dirty = None
+        frame_profiler.lap('overlay')
+        if dirty is None:
+            pygame.display.flip()
         else:
-            screen_help.draw(sim, sim.screen, rect)
-        pygame.display.flip()
+            pygame.display.update(dirty)
+        frame_profiler.lap('flip')
+        frame_profiler.commit()
+        sim.frame_count += 1
+    if worker is not None:
+        worker.stop()
     sim.shutdown()
 
 def handle_key(sim, event):
@@ -170,6 +385,17 @@ def handle_key(sim, event):
         screen_excel_loader.handle_key(sim, k)
         return
 
+    # Replay scrubbing
+    if sim.replay is not None:
+        steps = {pygame.K_COMMA: -1, pygame.K_PERIOD: 1, pygame.K_LEFTBRACKET: -100, pygame.K_RIGHTBRACKET: 100,
+                 pygame.K_HOME: -len(sim.replay), pygame.K_END: len(sim.replay)}
+        if k in steps:
+            sim.seek_replay(steps[k])
+            return
+        if k == pygame.K_l:
+            sim.stop_replay()
+            return
+
     # Quick shortcuts
     if k == pygame.K_h:
         set_screen(sim, help=True)
@@ -192,10 +418,16 @@ def handle_key(sim, event):
             sim.simulation_time_accumulator = 0.0
     elif k == pygame.K_s and sim.step_mode:
         sim.step_ready = True
+    elif k == pygame.K_u:
+        sim.toggle_update_mode()
+    elif k == pygame.K_b:
+        sim.toggle_turbo()
     elif k == pygame.K_k:
         sim.toggle_4k_mode()
     elif k == pygame.K_F11:
         sim.toggle_fullscreen()
+    elif k == pygame.K_F3:
+        sim.toggle_profiler()
     elif k in (pygame.K_PLUS, pygame.K_KP_PLUS):
         sim.iterations_per_second += 5
     elif k in (pygame.K_MINUS, pygame.K_KP_MINUS):
@@ -216,6 +448,9 @@ def handle_key(sim, event):
     elif k == pygame.K_a:
         if sim.display_curve_screen:
             sim.auto_scale_waves = not sim.auto_scale_waves
+    elif k == pygame.K_v:
+        if sim.display_neuron_matrix:
+            sim.matrix_view = 'heatmap' if sim.matrix_view == 'circles' else 'circles'
 
 
 def set_screen(sim, menu=False, help=False, matrix=False, curve=False, wave=False, movement=False, worm=False, options=False,
@@ -258,4 +493,4 @@ def route_mouse(sim, pos, button):
 
 
 if __name__ == "__main__":
-    main()
+    raise SystemExit(main())
@@ -0,0 +1,190 @@
+"""neuron_state.py
+
+Struct-of-arrays storage for the postsynaptic neuron state.
+
+connectome.postsynaptic used to be a dict of 5-element lists
+[thisState, nextState, PreviousValue, activated, decroissance].  It is now a
+NeuronStateStore: one contiguous NumPy array per column plus a name -> index
+map, so the step engine works on whole columns at once.
+
+The store still behaves like the old dict (keys(), items(), `in`, get(),
+`postsynaptic['AVAL'][thisState] = v`, `postsynaptic[name] = [0,0,0,0,0]`),
+so screens, random initialization and the Excel loaders keep working
+unchanged.  Row access goes through a small NeuronRow view; hot paths should
+use the column arrays instead.
+"""
+
+from __future__ import annotations
+
+from bisect import bisect_left
+from collections.abc import MutableMapping
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+# Column layout (same indices as connectome.py / Simulator.thisState ...)
+THIS_STATE = 0
+NEXT_STATE = 1
+PREV_VALUE = 2
+ACTIVATED = 3
+DECROISSANCE = 4
+NUM_COLUMNS = 5
+
+
+class NeuronRow:
+    """List-like view of one neuron's columns inside a NeuronStateStore."""
+
+    __slots__ = ("_store", "_i")
+
+    def __init__(self, store: "NeuronStateStore", i: int):
+        self._store = store
+        self._i = i
+
+    def __len__(self):
+        return NUM_COLUMNS
+
+    def __getitem__(self, col):
+        if isinstance(col, slice):
+            return [float(v) for v in self._store._data[col, self._i]]
+        return float(self._store._data[col, self._i])
+
+    def __setitem__(self, col, value):
+        if isinstance(col, slice):
+            self._store._data[col, self._i] = [float(v) for v in value]
+        else:
+            self._store._data[col, self._i] = value
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __repr__(self):
+        return repr(self[:])
+
+
+class NamePrefixIndex:
+    """Sorted neuron names answering `key.startswith(prefix)` with two bisects."""
+
+    def __init__(self, names: Sequence[str]):
+        order = sorted(range(len(names)), key=names.__getitem__)
+        self._sorted = [names[i] for i in order]
+        self._ids = np.array(order, dtype=np.int64)
+
+    def lookup(self, prefix: str) -> np.ndarray:
+        """Indices of every name starting with `prefix` (sorted by name)."""
+        lo = bisect_left(self._sorted, prefix)
+        hi = bisect_left(self._sorted, prefix + "\uffff", lo)
+        return self._ids[lo:hi]
+
+    def lookup_all(self, prefixes: Sequence[str]) -> np.ndarray:
+        """Sorted, de-duplicated indices matching any of `prefixes`."""
+        parts = [self.lookup(p) for p in prefixes]
+        if not parts:
+            return self._ids[:0]
+        return np.unique(np.concatenate(parts))
+
+
+class NeuronStateStore(MutableMapping):
+    def __init__(self, capacity: int = 512):
+        self._names: List[str] = []
+        self.index: Dict[str, int] = {}
+        self._data = np.zeros((NUM_COLUMNS, max(1, int(capacity))), dtype=np.float64)
+        # Bumped whenever the set / order of names changes
+        self.version = 0
+        self._prefix_index: Optional[NamePrefixIndex] = None
+        self._prefix_version = -1
+
+    # ------------------------------------------------------------------
+    # Column arrays (views, valid until the next neuron is added)
+    # ------------------------------------------------------------------
+    def column(self, col: int) -> np.ndarray:
+        return self._data[col, :len(self._names)]
+
+    @property
+    def names(self) -> List[str]:
+        return self._names
+
+    @property
+    def this_state(self) -> np.ndarray:
+        return self.column(THIS_STATE)
+
+    @property
+    def next_state(self) -> np.ndarray:
+        return self.column(NEXT_STATE)
+
+    @property
+    def previous_value(self) -> np.ndarray:
+        return self.column(PREV_VALUE)
+
+    @property
+    def activated(self) -> np.ndarray:
+        return self.column(ACTIVATED)
+
+    @property
+    def decroissance(self) -> np.ndarray:
+        return self.column(DECROISSANCE)
+
+    def indices_of(self, names: Sequence[str]) -> np.ndarray:
+        """Index array for the given names (unknown names are skipped)."""
+        index = self.index
+        return np.array([index[n] for n in names if n in index], dtype=np.int64)
+
+    def prefix_index(self) -> NamePrefixIndex:
+        """NamePrefixIndex over the current names (rebuilt only when they change)."""
+        if self._prefix_version != self.version:
+            self._prefix_index = NamePrefixIndex(self._names)
+            self._prefix_version = self.version
+        return self._prefix_index
+
+    def reset_values(self) -> None:
+        """Zero every column for every neuron (keeps names)."""
+        self._data[:, :len(self._names)] = 0.0
+
+    # ------------------------------------------------------------------
+    # Dict-compatible view
+    # ------------------------------------------------------------------
+    def _append(self, name: str) -> int:
+        i = len(self._names)
+        if i >= self._data.shape[1]:
+            grown = np.zeros((NUM_COLUMNS, self._data.shape[1] * 2), dtype=np.float64)
+            grown[:, :i] = self._data[:, :i]
+            self._data = grown
+        self._names.append(name)
+        self.index[name] = i
+        self._data[:, i] = 0.0
+        self.version += 1
+        return i
+
+    def __getitem__(self, name) -> NeuronRow:
+        return NeuronRow(self, self.index[name])
+
+    def __setitem__(self, name, values) -> None:
+        i = self.index.get(name)
+        if i is None:
+            i = self._append(name)
+        self._data[:, i] = [float(v) for v in values]
+
+    def __delitem__(self, name) -> None:
+        i = self.index.pop(name)
+        n = len(self._names)
+        self._data[:, i:n - 1] = self._data[:, i + 1:n]
+        del self._names[i]
+        for j in range(i, n - 1):
+            self.index[self._names[j]] = j
+        self.version += 1
+
+    def __contains__(self, name) -> bool:
+        return name in self.index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._names)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def clear(self) -> None:
+        self._names.clear()
+        self.index.clear()
+        self.version += 1
+
+    def __repr__(self):
+        return f"NeuronStateStore({len(self._names)} neurons)"
@@ -0,0 +1,105 @@
+"""profiler.py
+
+Per-phase timers for the simulation step and the main loop (F3 HUD).
+
+A PhaseProfiler is a lap timer: start() once per sample (step or frame),
+then lap(phase) at the end of each phase adds the time since the previous
+lap to that phase; commit() closes the sample.  Each phase keeps its last
+`window` samples in a RingBuffer, from which the HUD reads mean / p99 /
+max and a histogram of the rolling window.
+
+Disabled (the default), lap() is a single attribute test, so the
+instrumentation stays in the step at no measurable cost.  No pygame.
+"""
+
+from __future__ import annotations
+
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from trace_buffer import RingBuffer
+
+# Samples kept per phase (steps or frames)
+DEFAULT_WINDOW = 300
+
+
+class PhaseProfiler:
+    def __init__(self, window: int = DEFAULT_WINDOW, enabled: bool = False):
+        self.window = window
+        self.enabled = enabled
+        self._samples: Dict[str, RingBuffer] = {}  # phase -> seconds, in first-seen order
+        self._current: Dict[str, float] = {}
+        self._t = time.perf_counter()
+
+    def clear(self) -> None:
+        self._samples.clear()
+        self._current.clear()
+
+    def start(self) -> None:
+        if self.enabled:
+            self._current = dict.fromkeys(self._samples, 0.0)
+            self._t = time.perf_counter()
+
+    def lap(self, phase: str) -> None:
+        """Charge the time since the previous lap (or start) to `phase`."""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self._current[phase] = self._current.get(phase, 0.0) + (now - self._t)
+        self._t = now
+
+    def commit(self) -> None:
+        """Close the sample; phases not reached this time record 0."""
+        if not self.enabled:
+            return
+        for phase, seconds in self._current.items():
+            buf = self._samples.get(phase)
+            if buf is None:
+                buf = self._samples[phase] = RingBuffer(self.window)
+            buf.append(seconds)
+        self._current = {}
+
+    # ------------------------------------------------------------------
+    # Rolling statistics (milliseconds)
+    # ------------------------------------------------------------------
+    def phases(self) -> List[str]:
+        return list(self._samples)
+
+    def samples(self, phase: str) -> np.ndarray:
+        buf = self._samples.get(phase)
+        return buf.array() * 1000.0 if buf else np.zeros(0)
+
+    def stats(self, phase: str) -> dict:
+        ms = self.samples(phase)
+        if not len(ms):
+            return {"mean": 0.0, "p50": 0.0, "p99": 0.0, "max": 0.0, "count": 0}
+        p50, p99 = np.percentile(ms, [50, 99])
+        return {"mean": float(ms.mean()), "p50": float(p50), "p99": float(p99), "max": float(ms.max()),
+                "count": len(ms)}
+
+    def total(self) -> np.ndarray:
+        """Per-sample sum over the phases (ms), for the samples all phases share."""
+        arrays = [self.samples(p) for p in self.phases()]
+        if not arrays:
+            return np.zeros(0)
+        n = min(len(a) for a in arrays)
+        return np.sum([a[len(a) - n:] for a in arrays], axis=0)
+
+    def histogram(self, phase: str, bins: int = 12, low: float = 0.001, high: float = 100.0) -> np.ndarray:
+        """Counts of the rolling window over `bins` log-spaced bins from low to high ms.
+
+        Out-of-range samples go to the first / last bin.
+        """
+        ms = np.clip(self.samples(phase), low, high)
+        edges = np.geomspace(low, high, bins + 1)
+        return np.histogram(ms, edges)[0]
+
+    def report(self) -> str:
+        """Plain-text table of the phases (headless runs)."""
+        rows = [f"{'phase':<24}{'mean ms':>10}{'p99 ms':>10}{'max ms':>10}"]
+        for phase in self.phases():
+            s = self.stats(phase)
+            rows.append(f"{phase:<24}{s['mean']:>10.4f}{s['p99']:>10.4f}{s['max']:>10.4f}")
+        return "\n".join(rows)
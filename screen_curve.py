@@ -1,10 +1,18 @@
 """screen_curve.py corrected
 - no crash on empty values
 - robust autoscale
+- bounded history (sim.trace_horizon samples per trace)
+- frame time independent of the history length (min/max over a fixed
+  number of columns, one filled span per column)
 """
 
+import numpy as np
 import pygame
 
+# Envelope columns: one per COLUMN_WIDTH pixels, at most MAX_COLUMNS
+COLUMN_WIDTH = 2
+MAX_COLUMNS = 960
+
 def draw(sim, surface, rect):
     surface.fill(sim.BLACK)
     left_margin = 150
@@ -31,26 +39,27 @@ def draw(sim, surface, rect):
     if not sim.neuron_data:
         return
 
-    all_values = []
-    for data in sim.neuron_data.values():
-        if data['values']:
-            all_values.extend(data['values'])
+    # histories are TraceBuffers (trace_buffer.py): the range of a trace is
+    # an O(log n) query on its min/max pyramid
+    ranges = [data['values'].minmax() for data in sim.neuron_data.values() if data['values']]
 
-    if not all_values:
+    if not ranges:
         sim.max_value = 1
         sim.min_value = 0
     else:
+        data_max = max(hi for _, hi in ranges)
+        data_min = min(lo for lo, _ in ranges)
         if sim.auto_scale_waves:
-            sim.max_value = max(all_values)
-            sim.min_value = min(all_values)
+            sim.max_value = data_max
+            sim.min_value = data_min
         else:
             if sim.scale_reset:
                 sim.scale_reset = False
-                sim.max_value = max(all_values)
-                sim.min_value = min(all_values)
+                sim.max_value = data_max
+                sim.min_value = data_min
             else:
-                sim.max_value = getattr(sim, 'max_value', max(all_values))
-                sim.min_value = getattr(sim, 'min_value', min(all_values))
+                sim.max_value = getattr(sim, 'max_value', data_max)
+                sim.min_value = getattr(sim, 'min_value', data_min)
 
     scale_x = plot_width / max(max_iterations - 1, 1)
     scale_y = plot_height / (sim.max_value - sim.min_value + 1e-9)
@@ -74,15 +83,31 @@ def draw(sim, surface, rect):
         if not values:
             continue
 
+        # raw samples as a polyline while they fit the columns; beyond that
+        # one (min, max) per column, each drawn as a single vertical span
+        # stretched to meet the previous column
         color = data['color']
-        points = []
-        for i, val in enumerate(values):
-            x = left_margin + i * scale_x
-            y = rect.height - bottom_margin - (val - sim.min_value) * scale_y
-            points.append((x, y))
+        columns = max(1, min(MAX_COLUMNS, plot_width // COLUMN_WIDTH))
+        x, lo, hi = values.envelope(columns)
+        xs = left_margin + x * scale_x
+        bottom = rect.height - bottom_margin
+        if len(x) == len(values):
+            if len(x) > 1:
+                ys = bottom - (lo - sim.min_value) * scale_y
+                pygame.draw.lines(surface, color, False, np.column_stack((xs, ys)).tolist(), 2)
+            continue
 
-        if len(points) > 1:
-            pygame.draw.lines(surface, color, False, points, 2)
+        y_top = (bottom - (hi - sim.min_value) * scale_y).astype(np.int64)
+        y_bottom = (bottom - (lo - sim.min_value) * scale_y).astype(np.int64)
+        top = y_top.copy()
+        end = y_bottom.copy()
+        np.minimum(top[1:], y_bottom[:-1], out=top[1:])
+        np.maximum(end[1:], y_top[:-1], out=end[1:])
+        xs = xs.astype(np.int64)
+        widths = np.append(np.diff(xs), COLUMN_WIDTH)
+        fill = surface.fill
+        for rect_args in zip(xs.tolist(), top.tolist(), widths.tolist(), (end - top + 2).tolist()):
+            fill(color, rect_args)
 
     if sim.dropdown_menu_visible:
         draw_dropdown(sim, surface)
@@ -111,9 +136,7 @@ def handle_mouse_click(sim, pos, button):
         if 0 <= index < len(sim.preconfigured_sets):
             set_name = list(sim.preconfigured_sets.keys())[index]
             for neuron_name in sim.preconfigured_sets[set_name]:
-                if neuron_name not in sim.neuron_data:
-                    color = sim.colors[len(sim.neuron_data) % len(sim.colors)]
-                    sim.neuron_data[neuron_name] = {'values': [], 'activation_times': [], 'color': color}
+                sim.watch_neuron(neuron_name)
             sim.scale_reset = True
 
         sim.dropdown_menu_visible = False
@@ -1,4 +1,3 @@
-import re
 import os
 import pygame
 
@@ -9,7 +8,8 @@ except Exception:
     tk = None
     filedialog = None
 
-from excel_matrix_pylightxl import list_sheets, pylightxl_available, pylightxl_error
+from excel_matrix_pylightxl import build_models, list_sheets, pylightxl_available, pylightxl_error
+from gap_junction import INTEGRATORS as GAP_INTEGRATORS
 
 
 def _ensure_state(sim):
@@ -34,43 +34,10 @@ def _open_dialog():
     return path
 
 
-
-def _find_sheet(sheets, *, must_contain):
-    """Find the first sheet whose *word tokens* contain all required tokens.
-
-    Important: avoids the classic trap where 'asymmetric' contains 'symmetric' as a substring.
-    We tokenize sheet names into alphanum words, then match tokens on words.
-    """
-    want = [t.lower() for t in must_contain]
-    for s in sheets:
-        low = s.lower()
-        words = re.findall(r"[a-z0-9]+", low)
-        if all(t in words for t in want):
-            return s
-    return None
-
-
-def _build_models(sheets):
-    """Build model presets from SI7-like workbook sheet names."""
-    models = []
-    # canonical names used in your SI7 file
-    candidates = [
-        ("Hermaphrodite", "herm"),
-        ("Male", "male"),
-        ("Juvenile", "juvenile"),
-    ]
-    for label, prefix in candidates:
-        chem = _find_sheet(sheets, must_contain=[prefix, "chem", "grouped"])
-        gap = _find_sheet(sheets, must_contain=[prefix, "gap", "jn", "grouped", "symmetric"])
-        if chem:
-            models.append({"name": label, "chem": chem, "gap": gap or ""})
-    return models
-
-
 def _refresh_workbook_state(sim):
     """Load sheet names and build model list from the current excel_path."""
     sim.excel_sheets = list_sheets(sim.excel_path)
-    sim.excel_models = _build_models(sim.excel_sheets)
+    sim.excel_models = build_models(sim.excel_sheets)
     sim.excel_model_index = 0 if sim.excel_models else 0
 
 
@@ -125,6 +92,12 @@ def handle_key(sim, key):
         sim.excel_apply_gap = not sim.excel_apply_gap
         return
 
+    if key == pygame.K_i:
+        order = list(GAP_INTEGRATORS)
+        current = getattr(sim, "gap_integrator", "explicit")
+        sim.set_gap_integrator(order[(order.index(current) + 1) % len(order)] if current in order else order[0])
+        return
+
     if key == pygame.K_BACKSPACE:
         if sim.excel_path:
             sim.excel_path = sim.excel_path[:-1]
@@ -199,7 +172,7 @@ def draw(sim, surface, rect):
     title_y = int(rect.height * 0.05)
     sim.draw_text(surface, "Load neuron network (Excel)", rect.centerx, title_y,
                   sim.colorsName['green'], font_size=52, align='center')
-    sim.draw_text(surface, "O: open dialog   Enter: load model   Up/Down: select model   J: apply gap   Space/ESC: menu",
+    sim.draw_text(surface, "O: open dialog   Enter: load model   Up/Down: select model   J: apply gap   I: gap integrator   Space/ESC: menu",
                   rect.centerx, title_y + 45, sim.WHITE, font_size=24, align='center')
 
     box = pygame.Rect(int(rect.width * 0.08), int(rect.height * 0.22), int(rect.width * 0.84), 70)
@@ -246,6 +219,8 @@ def draw(sim, surface, rect):
 
     sim.draw_text(surface, f"[J] Apply GAP model: {'ON' if sim.excel_apply_gap else 'OFF'}",
                   right.left + 15, right.top + 140, sim.WHITE, font_size=20, align='left')
+    sim.draw_text(surface, f"[I] GAP integrator: {getattr(sim, 'gap_integrator', 'explicit')}",
+                  right.left + 15, right.top + 170, sim.WHITE, font_size=20, align='left')
 
     if not pylightxl_available():
         sim.draw_text(surface, "pylightxl not available: " + pylightxl_error(),
@@ -41,7 +41,7 @@ def draw(sim, surface, rect):
     # ----------------------------
     def _wrap_draw(x, y, text, fs, color):
         """Draw text wrapped inside current column width."""
-        font = pygame.font.Font(None, fs)
+        font = sim.get_font(fs)
         words = text.split(" ")
         cur = ""
         yy = y
@@ -122,8 +122,12 @@ def draw(sim, surface, rect):
     bullet("left", "P: step-by-step mode ON/OFF")
     bullet("left", "S: execute one step (only in step-by-step mode)")
     bullet("left", "+ / -: change speed (iterations per second)")
+    bullet("left", "U: update mode legacy (random order) / synchronous (deterministic)")
+    bullet("left", "B: turbo ON/OFF (steps as fast as fit in each frame, rate shown top right)")
     bullet("left", "F11: fullscreen toggle")
+    bullet("left", "F3: profiler HUD (ms per step / frame phase, FPS, steps/s)")
     bullet("left", "K: 4K mode toggle (if supported)")
+    bullet("left", "Replay (--replay log.npy): , / . one frame, [ / ] 100 frames, L: back to live")
 
     block_gap("left", 12)
     section("left", "Stimuli (debug)")
@@ -140,6 +144,7 @@ def draw(sim, surface, rect):
     line("right", "Matrix (M):", fs=section_fs, color=green)
     bullet("right", "Left click on a neuron: force ON/OFF")
     bullet("right", "Right click on a neuron: add/remove from plots (Curves/Raster)")
+    bullet("right", "V: circles / heat-map view (one pixel per neuron, for large networks)")
 
     block_gap("right", 10)
     line("right", "Curves (C):", fs=section_fs, color=green)
@@ -1,7 +1,31 @@
+"""screen_matrix.py
+
+Neuron matrix: one cell per neuron, a circle whose colour tells whether it
+just fired (red), changed (green) or is idle (blue), and whose radius grows
+with |state| / threshold; forced neurons get a white ring.
+
+The grid, the names and the hitboxes only change with the window, the
+network or the watched set, so they are built once into a cached layer
+(labels on a transparent surface).  Each frame only the cells whose colour
+class, radius or forced ring changed are repainted, and draw() returns
+their rects for pygame.display.update(); it returns None after a full
+redraw (first frame, other screen shown in between, invalidate()).
+
+Heat-map view (sim.matrix_view == 'heatmap', V key): the same grid with one
+pixel per neuron, coloured from the state arrays in one vectorized pass
+(colour class as hue, |state| / threshold as brightness, forced = white),
+written with pygame.surfarray and scaled to the window in a single blit.
+No labels and no per-neuron draw calls, for whole-network views of tens
+of thousands of neurons.
+"""
+
 import math
+import numpy as np
 import pygame
 from connectome import postsynaptic
 
+CELL_COLORS = ((0, 0, 255), (0, 255, 0), (255, 0, 0))  # idle, updated, fired
+
 def _build_layout(rect, count):
     if count <= 0:
         return 1, 1, rect.width, rect.height
@@ -15,56 +39,198 @@ def _cell_center(index, grid_size, cell_width, cell_height):
     col = index % grid_size
     return int(col * cell_width + cell_width / 2), int(row * cell_height + cell_height / 2)
 
+def _cell_rect(index, grid_size, cell_width, cell_height):
+    row = index // grid_size
+    col = index % grid_size
+    x0, x1 = int(col * cell_width), int((col + 1) * cell_width)
+    y0, y1 = int(row * cell_height), int((row + 1) * cell_height)
+    return pygame.Rect(x0, y0, x1 - x0, y1 - y0)
+
+def _static_layer(sim, surface, rect, threshold):
+    """Layout, labels and hitboxes, rebuilt only when their inputs change."""
+    neuron_names = postsynaptic.names
+    key = (id(surface), rect.size, postsynaptic.version, threshold, frozenset(sim.neuron_data))
+    layer = getattr(sim, '_matrix_layer', None)
+    if layer is not None and layer['key'] == key:
+        return layer
+
+    count = len(neuron_names)
+    grid_size, _, cell_width, cell_height = _build_layout(rect, count)
+    max_radius = max(6, int(min(cell_width, cell_height) * 0.33))
+    min_radius = max(4, int(max_radius * 0.42))
+    labels = pygame.Surface(rect.size, pygame.SRCALPHA)
+    centers, cells, hitboxes = [], [], []
+    for idx, neuron_name in enumerate(neuron_names):
+        cx, cy = _cell_center(idx, grid_size, cell_width, cell_height)
+        centers.append((cx, cy))
+        cells.append(_cell_rect(idx, grid_size, cell_width, cell_height))
+        hitboxes.append((pygame.Rect(cx-max_radius-4, cy-max_radius-4, (max_radius+4)*2, (max_radius+4)*2), neuron_name))
+        name_color = sim.colorsName['red'] if neuron_name in sim.neuron_data else sim.WHITE
+        sim.draw_text(labels, neuron_name, cx-22, cy-max_radius-26, name_color, font_size=18)
+
+    layer = {
+        'key': key, 'grid_size': grid_size, 'cell_width': cell_width, 'cell_height': cell_height,
+        'max_radius': max_radius, 'min_radius': min_radius,
+        'labels': labels, 'centers': centers, 'cells': cells, 'hitboxes': hitboxes,
+        # last painted state per cell (-1: never painted)
+        'color_class': np.full(count, -1, dtype=np.int8),
+        'radius': np.full(count, -1, dtype=np.int64),
+        'forced': np.zeros(count, dtype=bool),
+        'frame': None, 'text_rect': None,
+    }
+    sim._matrix_layer = layer
+    return layer
+
+def _cells_under(layer, area, count):
+    """Indices of the cells overlapping a screen area."""
+    grid_size = layer['grid_size']
+    c0 = max(0, int(area.left // layer['cell_width']))
+    c1 = min(grid_size - 1, int((area.right - 1) // layer['cell_width']))
+    r0 = max(0, int(area.top // layer['cell_height']))
+    r1 = min(grid_size - 1, int((area.bottom - 1) // layer['cell_height']))
+    idx = [r * grid_size + c for r in range(r0, r1 + 1) for c in range(c0, c1 + 1)]
+    return [i for i in idx if i < count]
+
+def invalidate(sim):
+    """Force a full redraw on the next frame (something was drawn on top)."""
+    layer = getattr(sim, '_matrix_layer', None)
+    if layer is not None:
+        layer['frame'] = None
+
+def _cell_states(sim, threshold):
+    """(color_class, norm, forced) per neuron, from the state arrays.
+
+    With the simulation on a worker thread (sim_worker.py) the arrays come
+    from the snapshot sampled for this frame, so a frame is never torn.
+    """
+    snapshot = getattr(sim, 'render_snapshot', None)
+    if snapshot is not None and snapshot.version == postsynaptic.version:
+        current_value = snapshot.this_state
+        previous_value = snapshot.previous_value
+        forced_index = snapshot.forced_index
+    else:
+        current_value = postsynaptic.this_state
+        previous_value = postsynaptic.previous_value
+        sim.update_forced_active_neurons()  # no-op unless toggles or network changed
+        forced_index = sim.forced_active_index
+    fired = (current_value >= threshold) & (previous_value < threshold)
+    updated = np.abs(current_value - previous_value) > 1e-9
+    color_class = np.where(fired, 2, np.where(updated, 1, 0)).astype(np.int8)
+    if threshold > 1e-9:
+        norm = np.minimum(np.abs(current_value) / threshold, 1.0)
+    else:
+        norm = np.zeros(len(current_value))
+    forced = np.zeros(len(current_value), dtype=bool)
+    forced[forced_index] = True
+    return color_class, norm, forced
+
 def draw(sim, surface, rect):
-    surface.fill(sim.BLACK)
-    neuron_names = list(postsynaptic.keys())
+    neuron_names = postsynaptic.names
     if not neuron_names:
+        surface.fill(sim.BLACK)
         sim.draw_text(surface, 'Aucun neurone.', 10, 10)
-        return
+        return None
 
-    grid_size, _, cell_width, cell_height = _build_layout(rect, len(neuron_names))
     threshold = float(getattr(sim, 'threshold', 30))
-    max_radius = max(6, int(min(cell_width, cell_height) * 0.33))
-    min_radius = max(4, int(max_radius * 0.42))
-    sim.matrix_hitboxes = []
+    if getattr(sim, 'matrix_view', 'circles') == 'heatmap':
+        draw_heatmap(sim, surface, rect, threshold)
+        return None
 
-    for idx, neuron_name in enumerate(neuron_names):
-        cx, cy = _cell_center(idx, grid_size, cell_width, cell_height)
-        state = postsynaptic[neuron_name]
-        current_value = float(state[getattr(sim, 'thisState', 0)])
-        previous_value = float(state[getattr(sim, 'PreviousValue', 2)])
+    layer = _static_layer(sim, surface, rect, threshold)
+    sim.matrix_hitboxes = layer['hitboxes']
+    frame = getattr(sim, 'frame_count', None)
+    full = frame is None or layer['frame'] is None or layer['frame'] != frame - 1
+    layer['frame'] = frame
 
-        fired = current_value >= threshold and previous_value < threshold
-        updated = abs(current_value - previous_value) > 1e-9
+    color_class, norm, forced = _cell_states(sim, threshold)
+    min_radius, max_radius = layer['min_radius'], layer['max_radius']
+    radius = (min_radius + (max_radius - min_radius) * norm).astype(np.int64)
 
-        color = (255,0,0) if fired else ((0,255,0) if updated else (0,0,255))
-        norm = min(abs(current_value) / threshold, 1.0) if threshold > 1e-9 else 0.0
-        radius = int(min_radius + (max_radius - min_radius) * norm)
+    text = sim.render_text(f'Iteration N°:{sim.iteration}')
+    text_rect = text.get_rect(topleft=(10, 10))
 
-        pygame.draw.circle(surface, color, (cx, cy), radius)
+    if full:
+        surface.fill(sim.BLACK)
+        changed = np.arange(len(neuron_names))
+    else:
+        changed = np.flatnonzero((color_class != layer['color_class']) | (radius != layer['radius'])
+                                 | (forced != layer['forced']))
+        # the iteration counter is redrawn over the cells beneath it
+        area = text_rect.union(layer['text_rect'] or text_rect)
+        changed = np.union1d(changed, _cells_under(layer, area, len(neuron_names))).astype(np.int64)
+    layer['color_class'], layer['radius'], layer['forced'] = color_class, radius, forced
 
-        if neuron_name in getattr(sim, 'forced_active_neurons', set()):
-            pygame.draw.circle(surface, (255,255,255), (cx, cy), radius + 3, 2)
+    labels, centers, cells = layer['labels'], layer['centers'], layer['cells']
+    dirty = []
+    for idx in changed.tolist():
+        cell = cells[idx]
+        surface.set_clip(cell)
+        surface.fill(sim.BLACK, cell)
+        r = int(radius[idx])
+        pygame.draw.circle(surface, CELL_COLORS[color_class[idx]], centers[idx], r)
+        if forced[idx]:
+            pygame.draw.circle(surface, (255,255,255), centers[idx], r + 3, 2)
+        surface.blit(labels, cell, cell)
+        dirty.append(cell)
+    surface.set_clip(None)
 
-        sim.matrix_hitboxes.append((pygame.Rect(cx-radius-4, cy-radius-4, (radius+4)*2, (radius+4)*2), neuron_name))
-        name_color = sim.colorsName['red'] if neuron_name in sim.neuron_data else sim.WHITE
-        sim.draw_text(surface, neuron_name, cx-22, cy-max_radius-26, name_color, font_size=18)
+    surface.blit(text, text_rect)
+    dirty.append(text_rect.union(layer['text_rect'] or text_rect))
+    layer['text_rect'] = text_rect
+    return None if full else dirty
 
+def draw_heatmap(sim, surface, rect, threshold):
+    count = len(postsynaptic)
+    grid_size = _build_layout(rect, count)[0]
+    heat = getattr(sim, '_matrix_heatmap', None)
+    key = (id(surface), rect.size, grid_size)
+    if heat is None or heat['key'] != key:
+        heat = {
+            'key': key, 'grid_size': grid_size,
+            'pixels': np.zeros((grid_size * grid_size, 3), dtype=np.uint8),
+            'small': pygame.Surface((grid_size, grid_size), 0, surface),
+        }
+        sim._matrix_heatmap = heat
+
+    color_class, norm, forced = _cell_states(sim, threshold)
+    brightness = 0.25 + 0.75 * norm
+    pixels = heat['pixels']
+    pixels[:count] = (np.asarray(CELL_COLORS, dtype=np.float64)[color_class] * brightness[:, None]).astype(np.uint8)
+    pixels[:count][forced] = 255
+    # rows of the grid are y: surfarray wants (x, y, rgb)
+    pygame.surfarray.blit_array(heat['small'], pixels.reshape(grid_size, grid_size, 3).transpose(1, 0, 2))
+    if surface.get_size() == rect.size:
+        pygame.transform.scale(heat['small'], rect.size, surface)  # straight into the screen
+    else:
+        surface.blit(pygame.transform.scale(heat['small'], rect.size), rect)
     sim.draw_text(surface, f'Iteration N°:{sim.iteration}', 10, 10)
 
+def _heatmap_hit(sim, pos):
+    heat = getattr(sim, '_matrix_heatmap', None)
+    if heat is None:
+        return None
+    grid_size = heat['grid_size']
+    width, height = heat['key'][1]
+    col = int(pos[0] * grid_size // max(width, 1))
+    row = int(pos[1] * grid_size // max(height, 1))
+    idx = row * grid_size + col
+    names = postsynaptic.names
+    return names[idx] if 0 <= col < grid_size and 0 <= idx < len(names) else None
+
 def handle_mouse_click(sim, pos, button):
-    for hit_rect, neuron_name in getattr(sim, 'matrix_hitboxes', []):
+    if getattr(sim, 'matrix_view', 'circles') == 'heatmap':
+        neuron_name = _heatmap_hit(sim, pos)
+        hitboxes = [] if neuron_name is None else [(pygame.Rect(pos, (1, 1)), neuron_name)]
+    else:
+        hitboxes = getattr(sim, 'matrix_hitboxes', [])
+    for hit_rect, neuron_name in hitboxes:
         if hit_rect.collidepoint(pos):
             if button == 1:
-                if neuron_name in sim.forced_active_neurons:
-                    sim.forced_active_neurons.remove(neuron_name)
-                else:
-                    sim.forced_active_neurons.add(neuron_name)
+                sim.toggle_manual_forced(neuron_name)
             elif button == 3:
                 if neuron_name in sim.neuron_data:
                     del sim.neuron_data[neuron_name]
                     sim.scale_reset = True
                 else:
-                    color = sim.colors[len(sim.neuron_data) % len(sim.colors)]
-                    sim.neuron_data[neuron_name] = {'values': [], 'activation_times': [], 'color': color}
+                    sim.watch_neuron(neuron_name)
             return
@@ -1,12 +1,50 @@
 import math
 import pygame
 
+from sim_logger import LOG_MODES
+
+# "1 pas sur N" choices of the log button
+LOG_EVERY_CHOICES = (1, 2, 5, 10, 100)
+
 
 def _ensure_options_state(sim):
     if not hasattr(sim, "options_selection_index"):
         sim.options_selection_index = 0
 
 
+def _next_choice(choices, value):
+    return choices[(choices.index(value) + 1) % len(choices)] if value in choices else choices[0]
+
+
+def _toggle_function(sim, idx):
+    sim.worm_functions[idx]['active'] = not sim.worm_functions[idx]['active']
+    sim.update_forced_active_neurons()
+
+
+def _set_log_option(sim, name, value):
+    """Change a log setting; an open log is restarted in a new file with it."""
+    setattr(sim, name, value)
+    if sim.logger is not None and sim.replay is None:
+        sim.open_log()
+
+
+def _items(sim):
+    """(label, active, action) of every button: the worm functions, then the log settings."""
+    items = []
+    for idx, func in enumerate(sim.worm_functions):
+        active = bool(func.get('active', False))
+        items.append((f"{func['name']} : {'ON' if active else 'OFF'}", active,
+                      lambda idx=idx: _toggle_function(sim, idx)))
+    items.append((f"Journal : mode {sim.log_mode}", None,
+                  lambda: _set_log_option(sim, 'log_mode', _next_choice(LOG_MODES, sim.log_mode))))
+    items.append((f"Journal : 1 pas sur {sim.log_every}", None,
+                  lambda: _set_log_option(sim, 'log_every', _next_choice(LOG_EVERY_CHOICES, sim.log_every))))
+    items.append((f"Journal : neurones suivis seulement : {'ON' if sim.log_watched_only else 'OFF'}",
+                  sim.log_watched_only,
+                  lambda: _set_log_option(sim, 'log_watched_only', not sim.log_watched_only)))
+    return items
+
+
 def _wrap_text(font, text, max_width):
     words = text.split()
     lines = []
@@ -56,21 +94,20 @@ def draw(sim, surface, rect):
     body_fs = 20 if rect.width <= 1920 else 24
     hint_fs = 24 if rect.width <= 1920 else 28
 
-    sim.draw_text(surface, "Options : Activation des fonctions du ver",
+    sim.draw_text(surface, "Options : fonctions du ver et journal",
                   rect.width // 2, 28, sim.colorsName['green'], font_size=title_fs, align='center')
 
-    count = len(sim.worm_functions)
-    if count == 0:
-        sim.draw_text(surface, "Aucune fonction disponible.", rect.centerx, rect.centery, sim.WHITE, font_size=28, align='center')
-        return
-
-    font = pygame.font.Font(None, body_fs)
+    items = _items(sim)
+    count = len(items)
+    font = sim.get_font(body_fs)
     sim.option_hitboxes = []
 
-    for idx, func in enumerate(sim.worm_functions):
+    for idx, (label, active, _) in enumerate(items):
         btn_rect = _get_button_rect(rect, idx, count)
-        active = bool(func.get('active', False))
-        fill = (70, 170, 70) if active else (110, 55, 55)
+        if active is None:  # setting with several values
+            fill = (60, 90, 160)
+        else:
+            fill = (70, 170, 70) if active else (110, 55, 55)
         pygame.draw.rect(surface, fill, btn_rect, border_radius=14)
 
         if idx == sim.options_selection_index:
@@ -78,7 +115,6 @@ def draw(sim, surface, rect):
         else:
             pygame.draw.rect(surface, sim.WHITE, btn_rect, 2, border_radius=14)
 
-        label = f"{func['name']} : {'ON' if active else 'OFF'}"
         text_lines = _wrap_text(font, label, btn_rect.width - 24)
         y = btn_rect.top + max(6, (btn_rect.height - len(text_lines) * (body_fs - 2)) // 2)
         for line in text_lines[:2]:
@@ -88,36 +124,33 @@ def draw(sim, surface, rect):
         sim.option_hitboxes.append((btn_rect, idx))
 
     sim.draw_text(surface,
-                  "ENTER : (dés)activer  |  ↑/↓ : naviguer  |  SPACE : retour menu  |  ESC : retour menu",
+                  "ENTER : (dés)activer / changer  |  ↑/↓ : naviguer  |  SPACE : retour menu  |  ESC : retour menu",
                   rect.width // 2, rect.height - 42, sim.WHITE, font_size=hint_fs, align='center')
 
 
 def handle_mouse_click(sim, pos):
     _ensure_options_state(sim)
-    count = len(sim.worm_functions)
+    items = _items(sim)
     hitboxes = getattr(sim, 'option_hitboxes', None)
     if hitboxes is None:
         rect = sim.screen.get_rect()
-        hitboxes = [(_get_button_rect(rect, idx, count), idx) for idx in range(count)]
+        hitboxes = [(_get_button_rect(rect, idx, len(items)), idx) for idx in range(len(items))]
 
     for btn_rect, idx in hitboxes:
-        if btn_rect.collidepoint(pos):
+        if btn_rect.collidepoint(pos) and idx < len(items):
             sim.options_selection_index = idx
-            sim.worm_functions[idx]['active'] = not sim.worm_functions[idx]['active']
-            sim.update_forced_active_neurons()
+            items[idx][2]()
             break
 
 
 def handle_key(sim, key):
     _ensure_options_state(sim)
 
-    count = max(1, len(sim.worm_functions))
+    items = _items(sim)
+    count = len(items)
     if key == pygame.K_UP:
         sim.options_selection_index = (sim.options_selection_index - 1) % count
     elif key == pygame.K_DOWN:
         sim.options_selection_index = (sim.options_selection_index + 1) % count
     elif key == pygame.K_RETURN:
-        idx = max(0, min(sim.options_selection_index, len(sim.worm_functions) - 1))
-        if sim.worm_functions:
-            sim.worm_functions[idx]['active'] = not sim.worm_functions[idx]['active']
-            sim.update_forced_active_neurons()
+        items[max(0, min(sim.options_selection_index, count - 1))][2]()
@@ -0,0 +1,78 @@
+"""screen_profiler.py
+
+Profiler HUD (F3), drawn over whatever screen is shown.
+
+Two tables from the rolling windows of profiler.py: the simulation step
+phases (sim.profiler, ms per step) and the main-loop phases
+(sim.frame_profiler, ms per frame), each row with mean and p99, a bar of
+its share of the total and a log-scale histogram of the window
+(0.001 ms .. 100 ms, left to right).  The header gives FPS, frame time and
+achieved steps per second.
+
+The panel is rebuilt every REFRESH seconds and blitted in between, so the
+numbers stay readable and the HUD costs one blit per frame.
+"""
+
+import time
+
+import pygame
+
+REFRESH = 0.25
+ROW_HEIGHT = 20
+BINS = 12
+BAR_WIDTH = 90
+FONT_SIZE = 18
+
+
+def _rows(profiler):
+    """(phase, stats, histogram) of the phases seen in the window."""
+    rows = []
+    for phase in profiler.phases():
+        stats = profiler.stats(phase)
+        if stats['max'] > 0:
+            rows.append((phase, stats, profiler.histogram(phase, BINS)))
+    return rows
+
+
+def _build(sim, fps):
+    step_rows = _rows(sim.profiler)
+    frame_rows = _rows(sim.frame_profiler)
+    frame_ms = sim.frame_profiler.total()
+    frame_mean = float(frame_ms.mean()) if len(frame_ms) else 0.0
+    lines = 3 + len(step_rows) + len(frame_rows)
+    panel = pygame.Surface((470, 16 + ROW_HEIGHT * lines), pygame.SRCALPHA)
+    panel.fill((0, 0, 0, 190))
+
+    y = 8
+    sim.draw_text(panel, f"FPS {fps:.0f}   frame {frame_mean:.2f} ms   {sim.steps_per_second:,.0f} steps/s",
+                  8, y, sim.WHITE, font_size=FONT_SIZE)
+    y += ROW_HEIGHT
+    for title, rows in (("step phases (ms/step)", step_rows), ("frame phases (ms/frame)", frame_rows)):
+        green = sim.colorsName['green']
+        sim.draw_text(panel, title, 8, y, green, font_size=FONT_SIZE)
+        sim.draw_text(panel, "mean", 230, y, green, font_size=FONT_SIZE, align='right')
+        sim.draw_text(panel, "p99", 290, y, green, font_size=FONT_SIZE, align='right')
+        y += ROW_HEIGHT
+        total = sum(stats['mean'] for _, stats, _ in rows) or 1.0
+        for phase, stats, hist in rows:
+            sim.draw_text(panel, phase, 16, y, sim.WHITE, font_size=FONT_SIZE)
+            sim.draw_text(panel, f"{stats['mean']:.3f}", 230, y, sim.WHITE, font_size=FONT_SIZE, align='right')
+            sim.draw_text(panel, f"{stats['p99']:.3f}", 290, y, sim.WHITE, font_size=FONT_SIZE, align='right')
+            share = int(BAR_WIDTH * stats['mean'] / total)
+            pygame.draw.rect(panel, sim.colorsName['red'], (300, y + 4, max(1, share), ROW_HEIGHT - 8))
+            peak = max(1, int(hist.max()))
+            for i, count in enumerate(hist.tolist()):
+                h = int((ROW_HEIGHT - 6) * count / peak)
+                if h:
+                    pygame.draw.rect(panel, (0, 191, 255), (400 + 5 * i, y + ROW_HEIGHT - 3 - h, 4, h))
+            y += ROW_HEIGHT
+    return panel
+
+
+def draw(sim, surface, rect, fps=0.0):
+    """Blit the HUD at the left edge; returns the rect it covers."""
+    hud = getattr(sim, '_profiler_hud', None)
+    now = time.perf_counter()
+    if hud is None or now - hud['time'] >= REFRESH:
+        hud = sim._profiler_hud = {'time': now, 'panel': _build(sim, fps)}
+    return surface.blit(hud['panel'], (rect.left + 10, rect.top + 40))
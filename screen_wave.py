@@ -1,3 +1,4 @@
+import numpy as np
 import pygame
 
 
@@ -16,11 +17,11 @@ def draw(sim, surface, rect):
     window = min(max_points, max(1, sim.iteration))
     scale_x = plot_width / max(1, window - 1)
 
-    vals=[]
-    for n in neurons:
-        vals.extend(sim.neuron_data[n].get('values', [])[-window:])
-    vmin=min(vals) if vals else 0
-    vmax=max(vals) if vals else 1
+    # one numpy pass per trace (the histories are RingBuffers, trace_buffer.py)
+    traces={n: np.asarray(sim.neuron_data[n].get('values', []), dtype=np.float64)[-window:] for n in neurons}
+    vals=[t for t in traces.values() if len(t)]
+    vmin=min(float(t.min()) for t in vals) if vals else 0
+    vmax=max(float(t.max()) for t in vals) if vals else 1
     if vmax-vmin<1e-6:
         vmax=vmin+1
 
@@ -28,16 +29,13 @@ def draw(sim, surface, rect):
     pygame.draw.line(surface, sim.WHITE, (left_margin, rect.height-bottom_margin), (rect.width-right_margin, rect.height-bottom_margin))
 
     for idx,n in enumerate(neurons):
-        data=sim.neuron_data[n].get('values', [])[-window:]
+        data=traces[n]
         color=sim.neuron_data[n]['color']
         sim.draw_text(surface,n,10,top_margin+idx*22,color=color,font_size=16)
-        pts=[]
-        for i,v in enumerate(data):
-            x=left_margin+i*scale_x
-            y=top_margin+plot_height-( (v-vmin)/(vmax-vmin) )*plot_height
-            pts.append((x,y))
-        if len(pts)>1:
-            pygame.draw.lines(surface,color,False,pts,1)
+        if len(data)>1:
+            xs=left_margin+np.arange(len(data))*scale_x
+            ys=top_margin+plot_height-((data-vmin)/(vmax-vmin))*plot_height
+            pygame.draw.lines(surface,color,False,np.column_stack((xs,ys)).tolist(),1)
 
     for i,val in enumerate([vmin,(vmin+vmax)/2,vmax]):
         y=top_margin+plot_height-(i/2)*plot_height
@@ -0,0 +1,559 @@
+"""sim_logger.py
+
+Simulation state loggers (thisState over time).
+
+Backends share one interface -- open(path_base, names, metadata),
+log(iteration, values), close() -- and the same pipeline: records are
+encoded on the simulation thread, batched into chunks, and full chunks go
+through a bounded queue to a writer thread that does the disk I/O.  When
+the queue is full, chunks are dropped and counted instead of blocking the
+frame loop (pass block=True to wait instead, e.g. for headless batch runs).
+In delta mode the step after a drop is written whole, so a drop only
+loses the dropped steps.
+
+What gets recorded:
+- sampling: `every` keeps one step in N (iteration % every == 0), and
+  `watch` restricts the log to a subset of neuron names (the manifest
+  `names` are then those neurons);
+- encoding (`mode`):
+  'dense'  one row per logged step: (iteration, state[n]);
+  'sparse' the nonzero values of each step as (neuron, value) entries;
+  'delta'  the entries of the values that moved by more than `tolerance`
+           since they were last recorded (the first logged step is
+           written whole; tolerance 0 = every change, lossless).
+  An entry costs 6 bytes (uint16 neuron id, float32 value; uint32 ids
+  above 65536 neurons) against 4 for a dense value, so a binary log
+  stores a step as a dense frame instead whenever its entries would be
+  larger (busy networks, first delta step).  Decimation and watched-only
+  logging shrink any mode proportionally.
+
+Files:
+- BinaryLogger: `<base>.npy`, a structured array readable with
+  np.load(path, mmap_mode='r'): the rows (row_dtype) in dense mode, the
+  entries (entry_dtype) in sparse / delta mode, which add one record
+  per logged step in `<base>.steps.npy` (iteration, offset of its
+  entries, dense frame index or -1; step_dtype) and the dense frames in
+  `<base>.frames.npy`.  A `<base>.json` manifest holds the names, mode,
+  sampling, counts, dropped steps and the run metadata given to open()
+  (network, thresholds, seed...).  The .npy headers are rewritten with
+  the final counts on close; if a run dies first, read_log derives the
+  counts from the file sizes.
+- CsvLogger: text; `#`-prefixed metadata lines, then either the
+  historical `iteration,<names...>` rows or `iteration,neuron,value`.
+
+convert_to_csv() (or `python sim_logger.py <log.npy> [out.csv]`) turns a
+binary log of any mode into dense CSV; to_dense() does the same in memory.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+FORMAT_NAME = "nemabot-log"
+FORMAT_VERSION = 3
+
+LOG_MODES = ("dense", "sparse", "delta")
+
+_NPY_MAGIC = b"\x93NUMPY\x01\x00"
+_NPY_HEADER_SIZE = 256  # total bytes before the data (fixed, so it can be rewritten in place)
+
+
+def row_dtype(n_neurons: int) -> np.dtype:
+    return np.dtype([("iteration", "<i8"), ("state", "<f4", (n_neurons,))])
+
+
+def entry_dtype(n_neurons: int) -> np.dtype:
+    return np.dtype([("neuron", "<u2" if n_neurons <= 1 << 16 else "<u4"), ("value", "<f4")])
+
+
+def step_dtype() -> np.dtype:
+    # entry: offset of the step's entries in <base>.npy; frame: row in
+    # <base>.frames.npy when the step is stored dense, else -1
+    return np.dtype([("iteration", "<i8"), ("entry", "<i8"), ("frame", "<i4")])
+
+
+def frame_dtype(n_neurons: int) -> np.dtype:
+    return np.dtype(("<f4", (n_neurons,)))
+
+
+def stream_path(npy_path: str, stream: str) -> str:
+    """Path of one stream of a binary log ('data', 'steps' or 'frames')."""
+    if stream == "data":
+        return npy_path
+    return os.path.splitext(npy_path)[0] + f".{stream}.npy"
+
+
+def _npy_header(dtype: np.dtype, rows: int) -> bytes:
+    # subarray dtypes (frames) are stored as 2-D arrays of their base type
+    header = repr({"descr": np.lib.format.dtype_to_descr(dtype.base), "fortran_order": False,
+                   "shape": (rows,) + dtype.shape})
+    body_size = _NPY_HEADER_SIZE - len(_NPY_MAGIC) - 2
+    header = header.encode("latin1").ljust(body_size - 1) + b"\n"
+    if len(header) != body_size:
+        raise ValueError("log header too large for the reserved space")
+    return _NPY_MAGIC + np.uint16(body_size).tobytes() + header
+
+
+class _ThreadedLogger:
+    """Sampling, encoding, chunking, bounded queue and writer thread.
+
+    A chunk is a dict of stream arrays: {'data': rows} in dense mode,
+    {'data': entries, 'steps': ..., 'frames': ...} otherwise, with the
+    step offsets relative to the chunk (the writer makes them absolute).
+    """
+
+    extension = ""
+    dense_fallback = False  # store busy steps as dense frames (sparse / delta)
+
+    def __init__(self, mode: str = "dense", every: int = 1, watch: Optional[Sequence[str]] = None,
+                 tolerance: float = 0.0, chunk_rows: int = 256, max_chunks: int = 64, block: bool = False):
+        if mode not in LOG_MODES:
+            raise ValueError(f"unknown log mode {mode!r} (expected one of {LOG_MODES})")
+        self.mode = mode
+        self.every = max(1, int(every))
+        self.watch = list(watch) if watch is not None else None
+        self.tolerance = float(tolerance)
+        self.chunk_rows = int(chunk_rows)
+        self.max_chunks = int(max_chunks)
+        self.block = block
+        self.path: Optional[str] = None
+        self.names: List[str] = []
+        self.metadata: dict = {}
+        self.records_written = 0   # logged steps on disk
+        self.dropped_records = 0   # logged steps lost to a full queue
+        self.written = {}          # stream -> records on disk
+        self.first_iteration: Optional[int] = None
+        self.last_iteration: Optional[int] = None
+        self._columns: Optional[np.ndarray] = None
+        self._previous: Optional[np.ndarray] = None
+        self._chunk = None
+        self._fill = 0
+        self._steps: List[tuple] = []
+        self._entries: List[np.ndarray] = []
+        self._frames: List[np.ndarray] = []
+        self._n_entries = 0
+        self._queue: Optional[queue.Queue] = None
+        self._thread: Optional[threading.Thread] = None
+        self._error: Optional[BaseException] = None
+
+    def dtypes(self) -> dict:
+        n = len(self.names)
+        if self.mode == "dense":
+            return {"data": row_dtype(n)}
+        return {"data": entry_dtype(n), "steps": step_dtype(), "frames": frame_dtype(n)}
+
+    # -- producer side (simulation thread) ------------------------------
+    def open(self, path_base: str, names: Sequence[str], metadata: Optional[dict] = None) -> str:
+        names = list(names)
+        if self.watch is not None:
+            index = {n: i for i, n in enumerate(names)}
+            watched = [n for n in self.watch if n in index]
+            self._columns = np.array([index[n] for n in watched], dtype=np.int64)
+            names = watched
+        else:
+            self._columns = None
+        self.names = names
+        self.metadata = dict(metadata or {})
+        self.path = path_base + self.extension
+        self.records_written = 0
+        self.dropped_records = 0
+        self.written = dict.fromkeys(self.dtypes(), 0)
+        self.first_iteration = self.last_iteration = None
+        self._previous = None
+        self._chunk = np.zeros(self.chunk_rows, dtype=row_dtype(len(names))) if self.mode == "dense" else None
+        self._fill = 0
+        self._reset_pending()
+        self._open_file()
+        self._queue = queue.Queue(maxsize=self.max_chunks)
+        self._thread = threading.Thread(target=self._writer, name="nemabot-logger", daemon=True)
+        self._thread.start()
+        return self.path
+
+    def log(self, iteration: int, values: np.ndarray) -> None:
+        if self._queue is None or iteration % self.every:
+            return
+        if self._columns is not None:
+            values = values[self._columns]
+        if self.first_iteration is None:
+            self.first_iteration = iteration
+        self.last_iteration = iteration
+
+        if self.mode == "dense":
+            row = self._chunk[self._fill]
+            row["iteration"] = iteration
+            row["state"] = values
+            self._fill += 1
+            if self._fill == self.chunk_rows:
+                self._queue_chunk({"data": self._chunk[:self._fill].copy()}, self._fill)
+                self._fill = 0
+            return
+
+        values = np.asarray(values, dtype=np.float32)
+        if self.mode == "sparse":
+            ids = np.flatnonzero(values)
+        elif self._previous is None:
+            ids = np.arange(values.shape[0])
+            self._previous = values.copy()
+        elif self.tolerance > 0.0:
+            ids = np.flatnonzero(np.abs(values - self._previous) > self.tolerance)
+            self._previous[ids] = values[ids]
+        else:
+            ids = np.flatnonzero(values != self._previous)
+            self._previous[ids] = values[ids]
+
+        entry = entry_dtype(len(self.names))
+        if self.dense_fallback and ids.size * entry.itemsize >= values.nbytes:
+            self._steps.append((iteration, self._n_entries, len(self._frames)))
+            self._frames.append(values.copy())
+        else:
+            self._steps.append((iteration, self._n_entries, -1))
+            if ids.size:
+                entries = np.empty(ids.size, dtype=entry)
+                entries["neuron"] = ids
+                entries["value"] = values[ids]
+                self._entries.append(entries)
+                self._n_entries += ids.size
+        if len(self._steps) >= self.chunk_rows:
+            self._flush_pending()
+
+    def _reset_pending(self) -> None:
+        self._steps, self._entries, self._frames = [], [], []
+        self._n_entries = 0
+
+    def _flush_pending(self) -> None:
+        if self._steps:
+            dtypes = self.dtypes()
+            chunk = {
+                "data": np.concatenate(self._entries) if self._entries else np.zeros(0, dtypes["data"]),
+                "steps": np.array(self._steps, dtype=dtypes["steps"]),
+                "frames": np.array(self._frames, dtype=np.float32).reshape(len(self._frames), len(self.names)),
+            }
+            self._queue_chunk(chunk, len(self._steps))
+        self._reset_pending()
+
+    def _queue_chunk(self, chunk: dict, steps: int) -> None:
+        try:
+            self._queue.put(chunk, block=self.block)
+        except queue.Full:
+            self.dropped_records += steps
+            self._previous = None  # delta: the next step is written whole again
+
+    def close(self) -> None:
+        if self._queue is None:
+            return
+        if self.mode == "dense":
+            if self._fill:
+                self._queue_chunk({"data": self._chunk[:self._fill].copy()}, self._fill)
+            self._fill = 0
+        else:
+            self._flush_pending()
+        self._queue.put(None)  # sentinel: always delivered, even when dropping
+        self._thread.join()
+        self._close_file()
+        self._queue = None
+        if self._error is not None:
+            raise self._error
+
+    @property
+    def is_open(self) -> bool:
+        return self._queue is not None
+
+    def manifest(self) -> dict:
+        return {
+            "format": FORMAT_NAME,
+            "version": FORMAT_VERSION,
+            "data": os.path.basename(self.path),
+            "mode": self.mode,
+            "every": self.every,
+            "tolerance": self.tolerance,
+            "watched_only": self.watch is not None,
+            "names": self.names,
+            "dtype": "float32",
+            "records": self.records_written,
+            "streams": dict(self.written),
+            "dropped_records": self.dropped_records,
+            "first_iteration": self.first_iteration,
+            "last_iteration": self.last_iteration,
+            "closed": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "metadata": self.metadata,
+        }
+
+    # -- writer thread --------------------------------------------------
+    def _writer(self) -> None:
+        while True:
+            chunk = self._queue.get()
+            if chunk is None:
+                return
+            if self._error is not None:
+                continue
+            try:
+                if "steps" in chunk:
+                    # chunk-relative offsets -> offsets in the files
+                    steps = chunk["steps"]
+                    steps["entry"] += self.written["data"]
+                    steps["frame"][steps["frame"] >= 0] += self.written["frames"]
+                self._write_chunk(chunk)
+                for stream, array in chunk.items():
+                    self.written[stream] += len(array)
+                self.records_written += len(chunk["steps"] if "steps" in chunk else chunk["data"])
+            except BaseException as e:  # reported on close()
+                self._error = e
+
+    # -- backend hooks ---------------------------------------------------
+    def _open_file(self) -> None:
+        raise NotImplementedError
+
+    def _write_chunk(self, chunk: dict) -> None:
+        raise NotImplementedError
+
+    def _close_file(self) -> None:
+        raise NotImplementedError
+
+
+class BinaryLogger(_ThreadedLogger):
+    extension = ".npy"
+    dense_fallback = True
+
+    def _open_file(self) -> None:
+        self._files = {}
+        for stream, dtype in self.dtypes().items():
+            f = self._files[stream] = open(stream_path(self.path, stream), "wb")
+            f.write(_npy_header(dtype, 0))
+        self._write_manifest()  # provisional, so an interrupted run stays readable
+
+    def _write_chunk(self, chunk: dict) -> None:
+        # data streams before the step index, so a step never points past them
+        for stream in ("data", "frames", "steps"):
+            if stream in chunk and len(chunk[stream]):
+                self._files[stream].write(chunk[stream].tobytes())
+
+    def _close_file(self) -> None:
+        for stream, dtype in self.dtypes().items():
+            f = self._files[stream]
+            f.seek(0)
+            f.write(_npy_header(dtype, self.written[stream]))
+            f.close()
+        self._files = {}
+        self._write_manifest()
+
+    def _write_manifest(self) -> None:
+        with open(manifest_path(self.path), "w") as f:
+            json.dump(self.manifest(), f, indent=1)
+
+
+class CsvLogger(_ThreadedLogger):
+    extension = ".csv"
+
+    def _open_file(self) -> None:
+        self._file = open(self.path, "w")
+        header = {k: v for k, v in self.manifest().items() if k not in ("names", "records", "streams",
+                                                                         "dropped_records", "first_iteration",
+                                                                         "last_iteration", "closed", "data")}
+        for key, value in header.items():
+            self._file.write(f"# {key}: {json.dumps(value)}\n")
+        if self.mode == "dense":
+            self._file.write("iteration," + ",".join(self.names) + "\n")
+        else:
+            self._file.write("iteration,neuron,value\n")
+
+    def _write_chunk(self, chunk: dict) -> None:
+        if self.mode == "dense":
+            self._file.writelines(_csv_lines(chunk["data"]))
+            return
+        entries, steps = chunk["data"], chunk["steps"]
+        counts = np.diff(np.append(steps["entry"], self.written["data"] + len(entries)))
+        iterations = np.repeat(steps["iteration"], counts)
+        names = self.names
+        self._file.writelines(f"{i},{names[n]},{v}\n" for i, n, v in
+                              zip(iterations.tolist(), entries["neuron"].tolist(), entries["value"].astype(str)))
+
+    def _close_file(self) -> None:
+        self._file.close()
+        self._file = None
+
+
+LOGGERS = {"binary": BinaryLogger, "csv": CsvLogger}
+
+
+def create_logger(kind: str, **kwargs) -> _ThreadedLogger:
+    try:
+        return LOGGERS[kind](**kwargs)
+    except KeyError:
+        raise ValueError(f"unknown log format {kind!r} (expected one of {sorted(LOGGERS)})") from None
+
+
+# ----------------------------------------------------------------------
+# Reading / conversion
+# ----------------------------------------------------------------------
+def manifest_path(npy_path: str) -> str:
+    return os.path.splitext(npy_path)[0] + ".json"
+
+
+def read_manifest(npy_path: str) -> dict:
+    with open(manifest_path(npy_path)) as f:
+        return json.load(f)
+
+
+def read_log(npy_path: str, mmap: bool = True, stream: str = "data") -> np.ndarray:
+    """Structured records of one stream of a binary log (memory-mapped by default).
+
+    Also works on a log whose run was interrupted before close(): the
+    record count is then taken from the file size.
+    """
+    path = stream_path(npy_path, stream)
+    with open(path, "rb") as f:
+        np.lib.format.read_magic(f)
+        shape, _, dtype = np.lib.format.read_array_header_1_0(f)
+        offset = f.tell()
+    row_shape = shape[1:]  # frames: (rows, neurons)
+    rows = (os.path.getsize(path) - offset) // (dtype.itemsize * int(np.prod(row_shape)))
+    if shape[0] == rows and not mmap:
+        return np.load(path)
+    if rows == 0:
+        return np.zeros((0,) + row_shape, dtype=dtype)  # nothing to map
+    mode = "r" if mmap else "c"
+    return np.memmap(path, dtype=dtype, mode=mode, offset=offset, shape=(rows,) + row_shape)
+
+
+class EntryLog:
+    """The streams of a sparse / delta binary log (memory-mapped)."""
+
+    def __init__(self, npy_path: str, manifest: Optional[dict] = None):
+        manifest = manifest or read_manifest(npy_path)
+        if manifest.get("version", 0) < 3:
+            raise ValueError(f"{npy_path}: {manifest.get('mode')} log of format version "
+                             f"{manifest.get('version')}, re-record it (version {FORMAT_VERSION} needed)")
+        self.mode = manifest["mode"]
+        self.size = len(manifest["names"])
+        self.entries = read_log(npy_path)
+        self.frames = read_log(npy_path, stream="frames")
+        steps = read_log(npy_path, stream="steps")
+        if manifest.get("streams", {}).get("steps") != len(steps):
+            # interrupted run: keep the steps whose data is known to be complete
+            # (the step index is written after the entries and frames it points to,
+            # but the last step's entries end where the next step's begin)
+            ok = (steps["entry"] <= len(self.entries)) & (steps["frame"] < len(self.frames))
+            steps = steps[:max(0, (len(ok) if ok.all() else int(np.argmin(ok))) - 1)]
+        self.steps = steps
+        self.iterations = np.asarray(self.steps["iteration"])
+        bounds = np.append(np.asarray(self.steps["entry"]), len(self.entries))
+        self._bounds = np.minimum(bounds, len(self.entries))
+
+    def __len__(self) -> int:
+        return len(self.steps)
+
+    def step(self, k: int, out: np.ndarray) -> None:
+        """Write step k's own values into `out` (sparse: the whole state)."""
+        frame = int(self.steps["frame"][k])
+        if frame >= 0:
+            out[:] = self.frames[frame]
+        else:
+            block = self.entries[self._bounds[k]:self._bounds[k + 1]]
+            out[block["neuron"]] = block["value"]
+
+    def advance(self, current: np.ndarray, a: int, b: int) -> None:
+        """Apply the delta steps [a, b) to `current` in place."""
+        if b <= a:
+            return
+        dense = np.flatnonzero(np.asarray(self.steps["frame"][a:b]) >= 0)
+        if len(dense):
+            d = a + int(dense[-1])
+            current[:] = self.frames[self.steps["frame"][d]]
+            a = d + 1
+        apply_records(current, self.entries[self._bounds[a]:self._bounds[b]])
+
+    def dense(self, start: int, stop: int, current: Optional[np.ndarray] = None) -> np.ndarray:
+        """States of steps [start:stop] as a (steps, neurons) array.
+
+        Delta logs: `current` is the state before `start` if known (it is
+        then advanced to the state at stop - 1), else it is rebuilt.
+        """
+        states = np.zeros((max(0, stop - start), self.size), dtype=np.float32)
+        if not len(states):
+            return states
+        if self.mode == "sparse":
+            lo, hi = self._bounds[start], self._bounds[stop]
+            rows = np.repeat(np.arange(len(states)), np.diff(self._bounds[start:stop + 1]))
+            block = self.entries[lo:hi]
+            states[rows, block["neuron"]] = block["value"]
+            frames = np.asarray(self.steps["frame"][start:stop])
+            dense = np.flatnonzero(frames >= 0)
+            states[dense] = self.frames[frames[dense]]
+            return states
+        # delta: the state in force before `start`, then each step's changes
+        if current is None:
+            current = np.zeros(self.size, dtype=np.float32)
+            self.advance(current, 0, start)
+        for r in range(len(states)):
+            self.step(start + r, current)
+            states[r] = current
+        return states
+
+
+def logged_iterations(manifest: dict, npy_path: str) -> np.ndarray:
+    """Iterations of the logged steps."""
+    if manifest.get("mode", "dense") == "dense":
+        return np.asarray(read_log(npy_path)["iteration"])
+    return EntryLog(npy_path, manifest).iterations
+
+
+def to_dense(npy_path: str, start: int = 0, stop: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """(iterations, states[len(iterations), n]) for logged steps [start:stop]."""
+    manifest = read_manifest(npy_path)
+    if manifest.get("mode", "dense") == "dense":
+        records = read_log(npy_path)
+        return np.asarray(records["iteration"][start:stop]), np.asarray(records["state"][start:stop])
+    log = EntryLog(npy_path, manifest)
+    start, stop, _ = slice(start, stop).indices(len(log))
+    stop = max(start, stop)
+    return log.iterations[start:stop], log.dense(start, stop)
+
+
+def apply_records(current: np.ndarray, records: np.ndarray) -> None:
+    """current[neuron] = the last value recorded for each neuron in `records`."""
+    if len(records):
+        ids = np.asarray(records["neuron"])[::-1]
+        neurons, last = np.unique(ids, return_index=True)
+        current[neurons] = np.asarray(records["value"])[::-1][last]
+
+
+def _csv_lines(chunk: np.ndarray):
+    # astype(str) prints the shortest float32 repr ("0.3", not "0.30000001192092896")
+    for iteration, state in zip(chunk["iteration"].tolist(), chunk["state"].astype(str)):
+        yield f"{iteration}," + ",".join(state) + "\n"
+
+
+def convert_to_csv(npy_path: str, csv_path: Optional[str] = None, chunk_rows: int = 4096) -> str:
+    """Write a binary log (any mode) as dense `iteration,<names...>` CSV; returns the CSV path."""
+    csv_path = csv_path or os.path.splitext(npy_path)[0] + ".csv"
+    manifest = read_manifest(npy_path)
+    dense = manifest.get("mode", "dense") == "dense"
+    log = read_log(npy_path) if dense else EntryLog(npy_path, manifest)
+    current = np.zeros(len(manifest["names"]), dtype=np.float32)  # delta: carried across chunks
+    with open(csv_path, "w") as f:
+        f.write("iteration," + ",".join(manifest["names"]) + "\n")
+        for start in range(0, len(log), chunk_rows):
+            stop = min(start + chunk_rows, len(log))
+            if dense:
+                rows = np.asarray(log[start:stop])
+            else:
+                rows = np.zeros(stop - start, dtype=row_dtype(len(current)))
+                rows["iteration"] = log.iterations[start:stop]
+                rows["state"] = log.dense(start, stop, current)
+            f.writelines(_csv_lines(rows))
+    return csv_path
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (2, 3):
+        print("usage: python sim_logger.py <log.npy> [out.csv]")
+        sys.exit(2)
+    print(convert_to_csv(sys.argv[1], sys.argv[2] if len(sys.argv) == 3 else None))
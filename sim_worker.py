@@ -0,0 +1,152 @@
+"""sim_worker.py
+
+Simulation stepping on a worker thread, decoupled from rendering.
+
+SimulationWorker runs step_simulation() at sim.iterations_per_second on
+its own deadline clock, so a slow frame no longer slows the simulation
+(and the renderer no longer has a catch-up loop that can spiral).  A
+backlog larger than `max_lag` seconds is dropped instead of replayed, and
+counted in `lagged_steps`.  In turbo mode (sim.turbo_mode) it steps
+unpaced, in bursts of sim.turbo_budget seconds.
+
+After every step the worker copies the neuron state of the matrix screen
+into the back buffer of a triple buffer and swaps it with the ready one;
+the renderer checks the latest complete step out with snapshot() at
+display rate, without waiting for the simulation.  The checked-out buffer
+is never written by the worker, so a frame is never torn.
+
+Anything that touches the simulation from the UI thread (events, Excel
+loads, start_simulation, and the screens that draw from the live state:
+curves, raster, worm, movement) must hold `sim.state_lock`; the worker
+holds it for each step.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+import numpy as np
+
+from connectome import postsynaptic
+
+
+@dataclass
+class StateSnapshot:
+    """Neuron state of one simulation step, as seen by the renderer."""
+    version: int = -1                 # postsynaptic.version of the arrays
+    this_state: np.ndarray = field(default_factory=lambda: np.zeros(0))
+    previous_value: np.ndarray = field(default_factory=lambda: np.zeros(0))
+    forced_index: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=np.int64))
+
+    def capture(self, sim) -> None:
+        """Copy the current state into this buffer (reusing its arrays)."""
+        self.version = postsynaptic.version
+        for name, source in (('this_state', postsynaptic.this_state),
+                             ('previous_value', postsynaptic.previous_value)):
+            target = getattr(self, name)
+            if target.shape == source.shape:
+                np.copyto(target, source)
+            else:
+                setattr(self, name, source.copy())
+        self.forced_index = sim.forced_active_index  # replaced, never modified in place
+
+
+class SimulationWorker:
+    def __init__(self, sim, max_lag: float = 0.25):
+        self.sim = sim
+        self.max_lag = max_lag
+        self.lagged_steps = 0
+        self.steps = 0
+        self._front = StateSnapshot()  # checked out by the renderer
+        self._ready = StateSnapshot()  # latest complete step
+        self._back = StateSnapshot()   # being written by the worker
+        self._fresh = False            # _ready is newer than _front
+        self._swap_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ------------------------------------------------------------------
+    # Triple buffer
+    # ------------------------------------------------------------------
+    def publish(self) -> None:
+        self._back.capture(self.sim)
+        with self._swap_lock:
+            self._ready, self._back = self._back, self._ready
+            self._fresh = True
+
+    def snapshot(self) -> StateSnapshot:
+        """Check out the latest complete step.
+
+        The buffer stays untouched until the next snapshot() call (do not
+        keep it beyond that: it is then handed back to the worker).
+        """
+        with self._swap_lock:
+            if self._fresh:
+                self._front, self._ready = self._ready, self._front
+                self._fresh = False
+            return self._front
+
+    # ------------------------------------------------------------------
+    # Thread
+    # ------------------------------------------------------------------
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        with self.sim.state_lock:
+            self.publish()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="nemabot-simulation", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _step(self) -> None:
+        with self.sim.state_lock:
+            if not self.sim.running:
+                self.sim.start_simulation()
+            self.sim.step_simulation()
+            self.publish()
+        self.steps += 1
+
+    def _run(self) -> None:
+        sim = self.sim
+        deadline = time.perf_counter()
+        while not self._stop.is_set():
+            if sim.step_mode:
+                if sim.step_ready:
+                    sim.step_ready = False
+                    self._step()
+                self._stop.wait(0.005)
+                deadline = time.perf_counter()
+                continue
+
+            if sim.turbo_mode:
+                # as fast as possible, in frame-sized bursts so the UI thread
+                # gets the lock in between
+                with sim.state_lock:
+                    if not sim.running:
+                        sim.start_simulation()
+                    self.steps += sim.run_for(sim.turbo_budget)
+                    self.publish()
+                self._stop.wait(0.001)
+                deadline = time.perf_counter()
+                continue
+
+            interval = 1.0 / max(1, sim.iterations_per_second)
+            now = time.perf_counter()
+            if now < deadline:
+                self._stop.wait(min(deadline - now, 0.05))
+                continue
+            if now - deadline > self.max_lag:
+                # too far behind: drop the backlog instead of replaying it
+                self.lagged_steps += int((now - deadline) / interval)
+                deadline = now
+            self._step()
+            deadline += interval
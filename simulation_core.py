@@ -0,0 +1,797 @@
+"""simulation_core.py
+
+Headless simulation core (no pygame).
+
+`SimulationCore` owns everything that is pure computation:
+- Network selection (built-in connectome.py or Excel) and its CSR compile.
+- Stepping: sensors, forced neurons, run_connectome, analog muscles,
+  motor control and worm kinematics.
+- Random initialization, forced-neuron resolution, the state log
+  (sim_logger.py) and replay of recorded logs (log_replay.py).
+- Per-phase timing of every step (self.profiler, profiler.py; off by
+  default).
+
+It never imports pygame, so it can run millions of steps on render-less
+batch nodes and starts in milliseconds.  The pygame `Simulator`
+(simulator.py) is a thin shell that adds the window, fonts and menu state
+on top of it.
+"""
+
+
+import time
+import math
+import random
+import os
+import threading
+import numpy as np
+# postsynaptic, muscles, musDleft, musVleft, musDright, musVright, threshold, Negthreshold, Negthreshold, Hyperpolarisation, createpostsynaptic
+from connectome import *
+from excel_connectome_pylightxl import ExcelConnectomePylightxl
+from excel_matrix_pylightxl import build_models, list_sheets
+from gap_junction import INTEGRATORS as GAP_INTEGRATORS, GapJunctionSymmetric
+import connectome_csr
+from connectome_csr import CompiledConnectome
+from muscle_layout import MuscleLayout
+from sim_logger import create_logger
+from log_replay import LogReplay
+from trace_buffer import DEFAULT_HORIZON, RingBuffer, TraceBuffer
+from profiler import PhaseProfiler
+
+# Sensor groups stimulated by food and touch (compiled to stimulus vectors)
+FOOD_SENSORS = ("ADFL", "ADFR", "ASGR", "ASGL", "ASIL", "ASIR", "ASJR", "ASJL")
+TOUCH_SENSORS = ("FLPR", "FLPL", "ASHL", "ASHR", "IL1VL", "IL1VR", "OLQDL", "OLQDR", "OLQVR", "OLQVL")
+
+# Colours given to watched neurons, in watch order (curve screens)
+TRACE_COLORS = (
+    (255, 0, 0), (0, 255, 0), (0, 0, 255), (255, 255, 0),
+    (255, 0, 255), (0, 255, 255), (255, 165, 0), (75, 0, 130),
+    (238, 130, 238), (0, 128, 128), (128, 128, 0), (128, 0, 128),
+    (192, 192, 192), (255, 20, 147), (0, 191, 255), (50, 205, 50),
+)
+
+# Seconds of stepping per frame in turbo mode (nemabot --turbo-budget)
+DEFAULT_TURBO_BUDGET = 0.012
+
+class SimulationCore:
+    def __init__(self, width=1920, height=1080, seed=None):
+        # World size (the pygame shell keeps it equal to the window size)
+        self.WIDTH, self.HEIGHT = width, height
+
+        # Simulation control (paused by default)
+        self.game_active = False
+        self.running = False
+        self.start_time = 0
+        self.current_time = 0
+        self.iteration = 0
+        self.iterations_per_second = 10
+        # Turbo: ignore iterations_per_second and step for turbo_budget
+        # seconds of every frame (run_for); achieved rate in steps_per_second
+        self.turbo_mode = False
+        self.turbo_budget = DEFAULT_TURBO_BUDGET
+        self.steps_per_second = 0.0
+        self._rate_iteration = 0
+        self._rate_time = time.perf_counter()
+        # Held while stepping or mutating the simulation when it runs on a
+        # worker thread (sim_worker.py)
+        self.state_lock = threading.RLock()
+        # Per-phase step timings (profiler.py), off until toggled (F3 HUD)
+        self.profiler = PhaseProfiler()
+        self.simulation_time_accumulator = 0.0
+        self.step_mode = True
+        self.step_ready = False
+        self.touch_neurons_active = False
+
+        # Connectome update mode:
+        # - 'legacy': neurons are visited in a random XOR-masked order each
+        #   step, drawn from self.rng (give a seed for reproducible runs)
+        # - 'synchronous': all decays first, then all firings from the
+        #   thisState snapshot; order-independent and deterministic
+        self.update_mode = 'legacy'
+        self.seed = seed
+        self.rng = random.Random(seed)
+
+        # Data
+        # Watched neurons (curve screens): name -> {'values', 'activation_times',
+        # 'color'}, the histories being RingBuffers of the last trace_horizon
+        # iterations (see watch_neuron)
+        self.trace_horizon = DEFAULT_HORIZON
+        self.neuron_data = {}
+        self.colors = list(TRACE_COLORS)
+        self.forced_active_neurons = set()
+        self.forced_active_index = np.empty(0, dtype=np.int64)
+        self.manual_forced_neurons = set()
+        # Forced functions screen aggregates into this set (logical neuron names).
+        # Your UI (screen_forced_functions.py) maintains sim.forced_neurons.
+        self.forced_neurons = set()
+        self.forced_functions_state = {}
+        self.functions_selection_index = 0
+        # Excel loader screen state
+        self.excel_path = ""
+        self.excel_gap_sheet = None
+        self.excel_status = "No file loaded."
+        self.loaded_network_from_excel = None
+        self.compiled_network = None  # CompiledConnectome over postsynaptic keys
+        self.gap_model = None
+        self.excel_apply_gap = True
+        self.gap_gain = 0.01
+        # 'explicit' (per-edge gain clamped to 0.45), 'substep' or 'implicit';
+        # the last two stay stable at large gap_gain without clamping
+        self.gap_integrator = 'explicit'
+        # Random initialization of neuron states
+        self.random_init_min = 0.0
+        self.random_init_max = float(threshold) * 1.10
+        self.random_init_step = max(0.5, float(threshold) / 20.0)
+        self.random_init_target_mode = 'all'  # 'all' or 'configured'
+        self.random_init_last_count = 0
+        self.random_init_last_range = (self.random_init_min, self.random_init_max)
+
+        # Triangle (movement)
+        self.triangle_pos = [self.WIDTH // 2, self.HEIGHT // 2]
+        self.triangle_angle = 0
+        self.triangle_speed = 4
+
+        # Environment
+        self.food_items = []
+        self.obstacles = []
+        self.food = 0
+        self.touch = False
+        # Scale of the sensor stimulus added each step (1.0 = one firing of each sensor)
+        self.food_intensity = 1.0
+        self.touch_intensity = 1.0
+
+        # postsynaptic columns
+        self.thisState = 0
+        self.nextState = 1
+        self.PreviousValue = 2
+        self.activated = 3
+        self.decroissance = 4
+
+        self.neurones = []
+        self.time_values = RingBuffer(self.trace_horizon)
+
+        # Diagnostics for the threshold screen
+        self.max_postsynaptic_value = 0
+        self.neurons_above_threshold = []
+        self.dist = 15
+        self.tfood = 0
+        # State log: 'binary' (.npy + .json manifest, see sim_logger.py), 'csv' or None
+        self.log_format = 'binary'
+        self.log_mode = 'dense'          # 'dense', 'sparse' (nonzero only) or 'delta' (changes only)
+        self.log_every = 1               # keep one step in N
+        self.log_tolerance = 0.0         # delta mode: only record moves larger than this
+        self.log_watched_only = False    # only the neurons watched on the curve screens (neuron_data)
+        self.log_created = False
+        self.logger = None
+        # Recorded run being replayed (start_replay), None when simulating
+        self.replay = None
+        self.replay_status = ""
+
+        # Analog muscle model: muscles do not fire like neurons.
+        # They integrate excitation continuously, saturate, then relax back to rest.
+        self.muscle_input_gain = 0.08
+        self.muscle_relaxation = 0.12
+        self.muscle_inhibition_gain = 0.20
+        self.muscle_max_activation = 100.0
+        self.muscle_neighbor_coupling = 0.10
+        # Per-muscle activation, aligned with muscle_layout.names
+        self.muscle_layout = None
+        self._muscle_layout_version = -1
+        self.muscle_activation = np.zeros(0)
+
+        # Worm functions (all OFF)
+        self.worm_functions = [
+            {'name': 'Photodétection (ASI, AFD, AWB, AWC, ASK)', 'neurons': ['ASI', 'AFD', 'AWB', 'AWC', 'ASK'], 'active': False},
+            {'name': 'Osmosensation (ASH, FLP, OLQ, IL1, AVM, ALM)', 'neurons': ['ASH', 'FLP', 'OLQ', 'IL1', 'AVM', 'ALM'], 'active': False},
+            {'name': 'Chimiosensation (ASE, ASG, ASI, ASK, AWA, AWB, AWC)', 'neurons': ['ASE', 'ASG', 'ASI', 'ASK', 'AWA', 'AWB', 'AWC'], 'active': False},
+            {'name': 'Mécanoréception (AVM, ALM, PLM, PVD, FLP, OLQ, IL1)', 'neurons': ['AVM', 'ALM', 'PLM', 'PVD', 'FLP', 'OLQ', 'IL1'], 'active': False},
+            {'name': 'Faim / satiété (ADF, ASG, ASI, ASJ, NSM, URX)', 'neurons': ['ADF', 'ASG', 'ASI', 'ASJ', 'NSM', 'URX'], 'active': False},
+            {'name': 'Oxygène / CO₂ (URX, AQR, PQR, BAG, SDQ)', 'neurons': ['URX', 'AQR', 'PQR', 'BAG', 'SDQ'], 'active': False},
+            {'name': 'Thermosensation (AFD, AWC)', 'neurons': ['AFD', 'AWC'], 'active': False},
+            {'name': 'Locomotion (DA, DB, VA, VB, DD, VD)', 'neurons': ['DA', 'DB', 'VA', 'VB', 'DD', 'VD'], 'active': False},
+            {'name': 'Muscles pharyngiens (MC, M3, M4, M5, M1, I1, I2, I3)', 'neurons': ['MC', 'M3', 'M4', 'M5', 'M1', 'I1', 'I2', 'I3'], 'active': False},
+            {'name': "Réflexe d'évitement (ASH, FLP, AVA, AVB)", 'neurons': ['ASH', 'FLP', 'AVA', 'AVB'], 'active': False},
+            {'name': 'Détection étirement/forme (PVD, DVA)', 'neurons': ['PVD', 'DVA'], 'active': False},
+            {'name': 'Neurones de contact (OLQ, IL1, CEP)', 'neurons': ['OLQ', 'IL1', 'CEP'], 'active': False},
+            {'name': 'Système reproducteur (HSN, VC)', 'neurons': ['HSN', 'VC'], 'active': False},
+            {'name': 'Neurones sociaux / spécialisés (RMG, SAA, SAB, URA)', 'neurons': ['RMG', 'SAA', 'SAB', 'URA'], 'active': False},
+        ]
+        self.update_forced_active_neurons()
+
+    def _forced_prefixes(self):
+        """Logical names (prefixes) forced by the active toggles."""
+        prefixes = set()
+        # Legacy worm_functions
+        for func in getattr(self, 'worm_functions', []):
+            if func.get('active'):
+                prefixes.update(func.get('neurons', []))
+        # New forced functions screen
+        prefixes.update(getattr(self, 'forced_neurons', set()))
+        prefixes.discard('FOOD_SENSOR')
+        prefixes.discard('TOUCH_SENSOR')
+        return prefixes
+
+    def update_forced_active_neurons(self, force=False):
+        """Recompute the set of postsynaptic neurons forced active each cycle.
+
+        Sources:
+        - self.worm_functions (legacy option toggles)
+        - self.forced_neurons (new forced-functions screen, logical neuron names)
+        - self.manual_forced_neurons (neurons clicked on the matrix screen)
+
+        Special pseudo-neurons (handled elsewhere):
+        - FOOD_SENSOR, TOUCH_SENSOR
+
+        Logical names are resolved through postsynaptic's prefix index, and
+        only when the toggles or the neuron list changed since the last call.
+        The result is kept both as a name set (forced_active_neurons) and as
+        an index array (forced_active_index) for run_connectome.
+        """
+        prefixes = self._forced_prefixes()
+        manual = getattr(self, 'manual_forced_neurons', set())
+        key = (postsynaptic.version, frozenset(prefixes), frozenset(manual))
+        if not force and key == getattr(self, '_forced_key', None):
+            return
+        self._forced_key = key
+
+        index = postsynaptic.prefix_index().lookup_all(sorted(prefixes))
+        index = np.union1d(index, postsynaptic.indices_of(manual))
+        names = postsynaptic.names
+        self.forced_active_index = index
+        # swapped, not mutated, so a render thread may iterate the old set
+        self.forced_active_neurons = {names[i] for i in index}
+
+    def toggle_manual_forced(self, name):
+        """Force / release one neuron by hand (matrix screen click)."""
+        if name in self.manual_forced_neurons:
+            self.manual_forced_neurons.discard(name)
+        else:
+            self.manual_forced_neurons.add(name)
+        self.update_forced_active_neurons()
+
+    def watch_neuron(self, name):
+        """Start recording a neuron for the curve screens (no-op if watched)."""
+        if name not in self.neuron_data:
+            color = self.colors[len(self.neuron_data) % len(self.colors)]
+            self.neuron_data[name] = {'values': TraceBuffer(self.trace_horizon),
+                                      'activation_times': RingBuffer(self.trace_horizon, np.int64),
+                                      'color': color}
+        return self.neuron_data[name]
+
+    def set_trace_horizon(self, horizon):
+        """Change how many iterations the curve screens keep (most recent kept)."""
+        self.trace_horizon = max(2, int(horizon))
+        self.time_values = self.time_values.resized(self.trace_horizon)
+        for data in self.neuron_data.values():
+            data['values'] = data['values'].resized(self.trace_horizon)
+            data['activation_times'] = data['activation_times'].resized(self.trace_horizon)
+
+    def set_gap_integrator(self, integrator):
+        """Select the gap-junction integrator (one of gap_junction.INTEGRATORS)."""
+        if integrator not in GAP_INTEGRATORS:
+            raise ValueError(f"unknown gap integrator {integrator!r} (expected one of {GAP_INTEGRATORS})")
+        self.gap_integrator = integrator
+
+    def set_seed(self, seed):
+        """Reseed the RNG used for legacy ordering and random initialization."""
+        self.seed = seed
+        self.rng.seed(seed)
+
+    def toggle_turbo(self):
+        self.turbo_mode = not self.turbo_mode
+        return self.turbo_mode
+
+    def run_for(self, budget):
+        """Step as many times as fit in `budget` seconds (at least once).
+
+        Stops early if the run pauses itself (end of a replay).  Returns the
+        number of steps taken.
+        """
+        end = time.perf_counter() + budget
+        steps = 0
+        while True:
+            self.step_simulation()
+            steps += 1
+            if self.step_mode or time.perf_counter() >= end:
+                return steps
+
+    def update_step_rate(self, window=0.5):
+        """Refresh steps_per_second from the iteration count (call once per frame)."""
+        now = time.perf_counter()
+        elapsed = now - self._rate_time
+        if elapsed >= window or self.iteration < self._rate_iteration:
+            self.steps_per_second = max(0, self.iteration - self._rate_iteration) / elapsed
+            self._rate_iteration = self.iteration
+            self._rate_time = now
+        return self.steps_per_second
+
+    def toggle_update_mode(self):
+        self.update_mode = 'synchronous' if self.update_mode == 'legacy' else 'legacy'
+        return self.update_mode
+
+    def _clamp_random_init_bounds(self):
+        """Keep random initialization bounds valid and ordered."""
+        try:
+            self.random_init_min = float(self.random_init_min)
+        except Exception:
+            self.random_init_min = 0.0
+        try:
+            self.random_init_max = float(self.random_init_max)
+        except Exception:
+            self.random_init_max = self.random_init_min
+        if self.random_init_min > self.random_init_max:
+            self.random_init_max = self.random_init_min
+        if self.random_init_max < self.random_init_min:
+            self.random_init_min = self.random_init_max
+
+    def set_random_init_bound(self, which, value):
+        if which == 'min':
+            self.random_init_min = float(value)
+        else:
+            self.random_init_max = float(value)
+        self._clamp_random_init_bounds()
+
+    def adjust_random_init_bound(self, which, delta):
+        if which == 'min':
+            self.random_init_min = float(self.random_init_min) + float(delta)
+        else:
+            self.random_init_max = float(self.random_init_max) + float(delta)
+        self._clamp_random_init_bounds()
+
+    def _expand_configured_neuron_names(self):
+        configured = set()
+
+        configured.update(getattr(self, 'forced_active_neurons', set()))
+        configured.update(getattr(self, 'neuron_data', {}).keys())
+
+        names = postsynaptic.names
+        for i in postsynaptic.prefix_index().lookup_all(sorted(self._forced_prefixes())):
+            configured.add(names[i])
+
+        return configured
+
+    def get_random_init_targets(self, mode=None):
+        mode = mode or getattr(self, 'random_init_target_mode', 'all')
+        if mode == 'configured':
+            configured = self._expand_configured_neuron_names()
+            names = [n for n in postsynaptic.keys() if n in configured]
+            if names:
+                return names
+        return list(postsynaptic.keys())
+
+    def trigger_random_initialization(self, mode=None):
+        """Initialize neuron states with random values in the configured range.
+
+        Mode:
+          - 'all': all neurons in postsynaptic
+          - 'configured': plotted/forced/configured neurons only; falls back to all if empty
+        """
+        self._clamp_random_init_bounds()
+        mode = mode or getattr(self, 'random_init_target_mode', 'all')
+        targets = self.get_random_init_targets(mode=mode)
+        if not targets:
+            self.random_init_last_count = 0
+            return 0
+
+        lo = float(self.random_init_min)
+        hi = float(self.random_init_max)
+
+        for name in targets:
+            if name not in postsynaptic:
+                continue
+            value = lo if abs(hi - lo) < 1e-12 else self.rng.uniform(lo, hi)
+            postsynaptic[name][self.thisState] = value
+            postsynaptic[name][self.nextState] = value
+            postsynaptic[name][self.PreviousValue] = value
+            postsynaptic[name][self.activated] = 1.0 if value >= threshold else 0.0
+            postsynaptic[name][self.decroissance] = 0.0
+
+        self.random_init_target_mode = mode
+        self.random_init_last_count = len(targets)
+        self.random_init_last_range = (lo, hi)
+
+        # Reset muscle integrator so the visible body state follows the new neuron state cleanly.
+        self.reset_analog_muscles()
+        return len(targets)
+
+    def _muscles(self):
+        """MuscleLayout over the current postsynaptic names (rebuilt when they change)."""
+        if self.muscle_layout is None or self._muscle_layout_version != postsynaptic.version:
+            self.muscle_layout = MuscleLayout.from_names(postsynaptic.names)
+            self._muscle_layout_version = postsynaptic.version
+            self.muscle_activation = np.zeros(self.muscle_layout.size)
+        return self.muscle_layout
+
+    def reset_analog_muscles(self):
+        self._muscles()
+        self.muscle_activation[:] = 0.0
+
+    def update_analog_muscles(self):
+        self._muscles().update(self.muscle_activation, postsynaptic.this_state,
+                               self.muscle_input_gain, self.muscle_relaxation, self.muscle_inhibition_gain,
+                               self.muscle_max_activation, self.muscle_neighbor_coupling)
+
+    def motorcontrol(self):
+        left, right = self._muscles().side_drives(self.muscle_activation).tolist()
+        self.accumleft = left
+        self.accumright = right
+        if self.accumleft == 0 and self.accumright == 0:
+            self.stop()
+        elif self.accumright <= 0 and self.accumleft < 0:
+            self.left_rot(); self.bwd()
+        elif self.accumright <= 0 and self.accumleft >= 0:
+            self.right_rot()
+        elif self.accumright >= 0 and self.accumleft <= 0:
+            self.left_rot()
+        elif self.accumright >= 0 and self.accumleft > 0:
+            self.right_rot(); self.fwd()
+        else:
+            self.stop()
+
+    def compile_network(self):
+        """(Re)build the CSR form of the active network over postsynaptic keys."""
+        names = list(postsynaptic.keys())
+        if self.loaded_network_from_excel is not None:
+            self.compiled_network = CompiledConnectome.from_excel_connectome(self.loaded_network_from_excel, names)
+        else:
+            self.compiled_network = CompiledConnectome.from_builtin(names)
+        return self.compiled_network
+
+    def _network(self):
+        net = self.compiled_network
+        if net is None or net.size != len(postsynaptic):
+            net = self.compile_network()
+        return net
+
+    def dendrite_accumulate(self, dneuron):
+        # Uses the Excel-loaded connectome when active, otherwise the
+        # hard-coded connectome.py functions (both compiled to CSR).
+        self._network().accumulate(dneuron, postsynaptic.next_state)
+
+    def apply_stimulus(self, sensors, intensity=1.0):
+        # Precompiled sum of the sensors' outgoing weights, one vector add
+        self._network().apply_stimulus(sensors, postsynaptic.next_state, intensity)
+
+    def fire_neuron(self, fneuron):
+        if fneuron != "MVULVA":
+            self.dendrite_accumulate(fneuron)
+
+    def set_neuron_value(self, fneuron, value):
+        if fneuron != "MVULVA":
+            postsynaptic[fneuron][self.nextState] = value
+
+    def bwd(self): self.move_triangle_backward()
+    def fwd(self): self.move_triangle_forward()
+    def left_rot(self): self.rotate_triangle_left()
+    def right_rot(self): self.rotate_triangle_right()
+    def stop(self): pass
+
+    def run_connectome(self):
+        net = self._network()
+        forced = self.forced_active_index
+        postsynaptic.this_state[forced] = threshold
+        postsynaptic.next_state[forced] = threshold
+        prof = self.profiler
+        prof.lap('forced')
+
+        # --- GAP junction coupling (optional, symmetric) ---
+        if self.gap_model is not None and self.excel_apply_gap:
+            self.gap_model.apply_step(postsynaptic, self.thisState, self.nextState, gain=self.gap_gain,
+                                      integrator=self.gap_integrator)
+            prof.lap('gap')
+
+        rank = None
+        if self.update_mode != 'synchronous':
+            random_mask = self.rng.randint(0, 0xFFFFFFFF)
+            rank = connectome_csr.legacy_order_rank(net.size, random_mask)
+        connectome_csr.step(net, postsynaptic.this_state, postsynaptic.next_state,
+                            postsynaptic.previous_value, postsynaptic.decroissance, rank,
+                            threshold, Negthreshold, NegthresholdHyperpolarisation)
+        prof.lap('decay/fire')
+
+        self.update_analog_muscles()
+        prof.lap('muscles')
+        self.motorcontrol()
+        prof.lap('motor')
+        self.iteration += 1
+
+    def load_network_from_excel(self, xlsx_path: str, chem_sheet: str, gap_symmetric_sheet: str | None = None, apply_gap: bool = True) -> bool:
+        """Load chemical sheet (+ optional symmetric gap-junction sheet) from XLSX (pylightxl).
+
+        - chem_sheet: e.g. 'herm chem grouped'
+        - gap_symmetric_sheet: e.g. 'herm gap jn grouped symmetric' (optional)
+        - apply_gap: toggle applying the GAP model during simulation
+        """
+        try:
+            chem = ExcelConnectomePylightxl.load(xlsx_path, sheet_name=chem_sheet)
+            self.loaded_network_from_excel = chem
+            self.excel_path = xlsx_path
+            self.excel_apply_gap = bool(apply_gap)
+
+            # Ensure postsynaptic has entries for all neurons in this network, then reset values.
+            chem.ensure_postsynaptic_entries(postsynaptic)
+            chem.reset_postsynaptic(postsynaptic)
+
+            # GAP symmetric (optional)
+            self.gap_model = None
+            self.excel_gap_sheet = gap_symmetric_sheet or None
+            if gap_symmetric_sheet:
+                gap_net = ExcelConnectomePylightxl.load(xlsx_path, sheet_name=gap_symmetric_sheet)
+                gap_net.ensure_postsynaptic_entries(postsynaptic)
+                self.gap_model = GapJunctionSymmetric.from_excel_connectome(gap_net)
+
+            self.compile_network()
+
+            self.excel_status = (
+                f"Loaded: {os.path.basename(xlsx_path)} | chem='{chem_sheet}'"
+                + (f" | gap='{gap_symmetric_sheet}'" if gap_symmetric_sheet else "")
+                + f" | neurons: {len(chem.neurons)}"
+            )
+            return True
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            self.loaded_network_from_excel = None
+            self.compiled_network = None
+            self.gap_model = None
+            self.excel_status = f"Excel load failed: {e}"
+            return False
+
+    def add_stimulus(self, spec: str) -> None:
+        """Hold a stimulus on for the whole run: 'food', 'touch' or 'forced:NAME[,NAME...]'.
+
+        Uses the forced-functions set: the FOOD_SENSOR / TOUCH_SENSOR
+        pseudo-neurons, or logical neuron names (prefixes).
+        """
+        kind, _, names = spec.partition(":")
+        if kind == "food":
+            self.forced_neurons.add('FOOD_SENSOR')
+        elif kind == "touch":
+            self.forced_neurons.add('TOUCH_SENSOR')
+        elif kind == "forced" and names.strip(", "):
+            self.forced_neurons.update(n.strip() for n in names.split(",") if n.strip())
+        else:
+            raise ValueError(f"bad stimulus {spec!r} (expected food, touch or forced:NAME[,NAME...])")
+
+    def load_network(self, spec: str) -> bool:
+        """Select a network from a spec (the format of network_description()).
+
+        - 'builtin': the hard-coded connectome.py network
+        - 'xlsx:PATH:MODEL': MODEL is a preset of the workbook ('herm',
+          'male', 'juvenile' or its full name), or explicit sheet names
+          'CHEM|GAP' (GAP optional)
+        """
+        if spec == "builtin":
+            self.unload_excel_network()
+            return True
+        kind, _, rest = spec.partition(":")
+        path, _, model = rest.rpartition(":")
+        if kind != "xlsx" or not path or not model:
+            raise ValueError(f"bad network spec {spec!r} (expected 'builtin' or 'xlsx:PATH:MODEL')")
+        chem, _, gap = model.partition("|")
+        for preset in build_models(list_sheets(path)):
+            if model.lower() in (preset["key"], preset["name"].lower()):
+                chem, gap = preset["chem"], preset["gap"]
+                break
+        return self.load_network_from_excel(path, chem, gap or None)
+
+    def unload_excel_network(self) -> None:
+        """Return to the built-in hard-coded connectome.py network."""
+        self.loaded_network_from_excel = None
+        self.excel_status = "No file loaded."
+        createpostsynaptic()
+        self.compile_network()
+
+    def start_simulation(self):
+        self.neurones = []
+        self.time_values = RingBuffer(self.trace_horizon)
+
+        # Diagnostics for the threshold screen
+        self.max_postsynaptic_value = 0
+        self.neurons_above_threshold = []
+        # Initialize postsynaptic storage.
+        if self.loaded_network_from_excel is not None:
+            self.loaded_network_from_excel.reset_postsynaptic(postsynaptic)
+        else:
+            createpostsynaptic()
+        self.compile_network()
+        self.dist = 15
+        self.tfood = 0
+        if not self.log_created:
+            self.open_log()
+            self.log_created = True
+        self.thisState = 0
+        self.nextState = 1
+        self.reset_analog_muscles()
+        self.running = True
+        self.start_time = time.time()
+
+    def step_simulation(self):
+        prof = self.profiler
+        prof.start()
+        self.current_time = time.time() - self.start_time
+        self.time_values.append(self.current_time)
+
+        # Apply pseudo sensors from the forced-functions screen.
+        if 'TOUCH_SENSOR' in getattr(self, 'forced_neurons', set()):
+            self.touch = True
+        if 'FOOD_SENSOR' in getattr(self, 'forced_neurons', set()):
+            self.food = max(self.food, 20)
+        prof.lap('sensors')
+
+        # Keep forced_active_neurons in sync (in case UI toggles changed)
+        self.update_forced_active_neurons()
+        prof.lap('forced')
+
+        if self.replay is not None:
+            # Replay: the state comes from the recorded log, not the connectome
+            if self.replay.position + 1 >= len(self.replay):
+                self.step_mode = True  # end of the recording: pause
+                prof.commit()
+                return
+            self.load_replay_frame(self.replay.position + 1)
+            prof.lap('replay')
+        else:
+            if self.touch or (self.touch_neurons_active and 0 < self.dist < 30):
+                self.activate_touch_neurons()
+            else:
+                if self.food > 15:
+                    self.apply_stimulus(FOOD_SENSORS, self.food_intensity)
+            prof.lap('sensors')
+
+            self.run_connectome()
+        self.update_worm_movement()
+        prof.lap('kinematics')
+
+        if self.tfood > 30:
+            self.tfood = 0
+
+        for neuron, data in self.neuron_data.items():
+            activation_value = postsynaptic[neuron][self.thisState]
+            prev_value = postsynaptic[neuron][self.PreviousValue]
+            data['values'].append(activation_value)
+            if activation_value >= threshold and prev_value < threshold:
+                data['activation_times'].append(self.iteration)
+        prof.lap('traces')
+
+        if self.logger is not None:
+            if self._log_version != postsynaptic.version:
+                # Network changed (Excel load): start a new log with the new names
+                self.close_log()
+                self.open_log()
+            self.logger.log(self.iteration, postsynaptic.this_state)
+            prof.lap('logging')
+        prof.commit()
+
+    # ------------------------------------------------------------------
+    # Replay of recorded runs (log_replay.py)
+    # ------------------------------------------------------------------
+    def start_replay(self, path):
+        """Drive the screens from a binary log instead of simulating."""
+        replay = LogReplay(path)
+        if not len(replay):
+            raise ValueError(f"empty log: {path}")
+        self.close_log()
+        self.log_created = True  # a replay is not recorded again
+        if not self.running:
+            self.start_simulation()
+        self.replay = replay
+        known = [n for n in replay.names if n in postsynaptic]
+        self._replay_src = np.array([i for i, n in enumerate(replay.names) if n in postsynaptic], dtype=np.int64)
+        self._replay_dst = postsynaptic.indices_of(known)
+        self.replay_status = (f"Replay: {os.path.basename(path)} | {len(replay)} frames | "
+                              f"{len(known)}/{len(replay.names)} neurons mapped")
+        postsynaptic.reset_values()
+        self.reset_analog_muscles()
+        self.running = True
+        self.load_replay_frame(0)
+        return self.replay_status
+
+    def stop_replay(self):
+        """Back to live simulation (restarted fresh on the next frame)."""
+        self.replay = None
+        self.running = False
+        self.log_created = False  # live runs get a fresh log again
+
+    def load_replay_frame(self, k):
+        replay = self.replay
+        k = max(0, min(int(k), len(replay) - 1))
+        if k != replay.position + 1:
+            # jump: the muscle integrator would otherwise carry stale activity
+            self.reset_analog_muscles()
+        previous = postsynaptic.this_state.copy()
+        values = replay.frame(k)[self._replay_src]
+        postsynaptic.this_state[self._replay_dst] = values
+        postsynaptic.next_state[self._replay_dst] = values
+        postsynaptic.previous_value[:] = previous
+        replay.position = k
+        self.iteration = replay.iteration_at(k)
+        self.update_analog_muscles()
+        self.motorcontrol()
+
+    def seek_replay(self, delta):
+        """Move the replay cursor by `delta` frames (scrubbing)."""
+        if self.replay is not None:
+            self.load_replay_frame(self.replay.position + delta)
+            self.update_worm_movement()
+
+    def move_triangle_forward(self):
+        self.triangle_pos[0] += self.triangle_speed * math.cos(math.radians(self.triangle_angle))
+        self.triangle_pos[1] += self.triangle_speed * math.sin(math.radians(self.triangle_angle))
+
+    def move_triangle_backward(self):
+        self.triangle_pos[0] -= self.triangle_speed * math.cos(math.radians(self.triangle_angle))
+        self.triangle_pos[1] -= self.triangle_speed * math.sin(math.radians(self.triangle_angle))
+
+    def rotate_triangle_left(self):
+        self.triangle_angle -= 5
+
+    def rotate_triangle_right(self):
+        self.triangle_angle += 5
+
+    def activate_touch_neurons(self):
+        self.apply_stimulus(TOUCH_SENSORS, self.touch_intensity)
+
+    def add_food(self):
+        self.tfood += 10
+
+    def update_worm_movement(self):
+        length_factor, curvature_offset, contraction = self._muscles().segments(self.muscle_activation,
+                                                                                self.muscle_max_activation)
+        self.muscle_segments = [
+            {"length_factor": lf, "curvature_offset": co, "contraction": c}
+            for lf, co, c in zip(length_factor.tolist(), curvature_offset.tolist(), contraction.tolist())
+        ]
+
+    def shutdown(self):
+        self.game_active = False
+        self.running = False
+        self.close_log()
+
+    def open_log(self, path_base=None, block=False):
+        """Start logging thisState every step (format: self.log_format).
+
+        block=True makes a full writer queue wait instead of dropping chunks.
+        """
+        self.close_log()
+        if not self.log_format:
+            return None
+        watch = list(self.neuron_data) if self.log_watched_only else None
+        self.logger = create_logger(self.log_format, mode=self.log_mode, every=self.log_every, watch=watch,
+                                    tolerance=self.log_tolerance, block=block)
+        if not path_base:
+            # a log restarted within the same second (new settings) gets a suffix
+            stamp = path_base = f"nemabot_simulation_log_{time.strftime('%Y%m%d_%H%M%S')}"
+            count = 1
+            while os.path.exists(path_base + self.logger.extension):
+                count += 1
+                path_base = f"{stamp}_{count}"
+        self._log_version = postsynaptic.version
+        return self.logger.open(path_base, postsynaptic.names, self.log_metadata())
+
+    def network_description(self):
+        excel = self.loaded_network_from_excel
+        if excel is None:
+            return "builtin"
+        sheets = [excel.sheet_name] + ([self.excel_gap_sheet] if self.excel_gap_sheet else [])
+        return f"xlsx:{self.excel_path}:" + "|".join(sheets)
+
+    def log_metadata(self):
+        """Run parameters recorded in every log header."""
+        return {
+            "network": self.network_description(),
+            "neurons": len(postsynaptic),
+            "threshold": threshold,
+            "neg_threshold": Negthreshold,
+            "hyperpolarisation": NegthresholdHyperpolarisation,
+            "seed": self.seed,
+            "update_mode": self.update_mode,
+            "gap": None if self.gap_model is None or not self.excel_apply_gap else
+                   {"gain": self.gap_gain, "integrator": self.gap_integrator},
+            "started": time.strftime('%Y-%m-%d %H:%M:%S'),
+            "start_iteration": self.iteration,
+        }
+
+    def close_log(self):
+        if self.logger is not None:
+            self.logger.close()
+            self.logger = None
@@ -0,0 +1,203 @@
+"""trace_buffer.py
+
+Fixed-capacity history of the curve screens (sim.neuron_data, sim.time_values).
+
+A RingBuffer keeps the last `capacity` samples of a trace in a NumPy array,
+so memory use and per-frame drawing cost stay flat however long the run.
+Every sample is written twice (at i and i + capacity), which keeps the
+history contiguous: `array()` is a zero-copy view in chronological order.
+
+The buffers behave like the lists they replace for the screens (len,
+indexing / slicing from the oldest sample, iteration, truth value).
+Samples older than the horizon are dropped; the full run stays available
+in the binary state log (sim_logger.py, read back with log_replay.py).
+"""
+
+from __future__ import annotations
+
+import numpy as np
+
+# Default horizon of the curve screens, in samples (one per iteration)
+DEFAULT_HORIZON = 20000
+
+
+class RingBuffer:
+    def __init__(self, capacity: int = DEFAULT_HORIZON, dtype=np.float64):
+        self.capacity = max(1, int(capacity))
+        self._data = np.zeros(2 * self.capacity, dtype=dtype)
+        self._count = 0    # samples written into this buffer
+        self._skipped = 0  # samples dropped before it (see resized)
+
+    def __len__(self) -> int:
+        return min(self._count, self.capacity)
+
+    def __bool__(self) -> bool:
+        return self._count > 0
+
+    @property
+    def total(self) -> int:
+        """Samples ever appended, including the dropped ones."""
+        return self._count + self._skipped
+
+    @property
+    def dropped(self) -> int:
+        """Samples that fell out of the horizon."""
+        return self.total - len(self)
+
+    def append(self, value) -> None:
+        i = self._count % self.capacity
+        self._data[i] = value
+        self._data[i + self.capacity] = value
+        self._count += 1
+
+    def extend(self, values) -> None:
+        for value in values:
+            self.append(value)
+
+    def array(self) -> np.ndarray:
+        """Chronological view of the kept samples (read-only, no copy)."""
+        start = self._count % self.capacity if self._count > self.capacity else 0
+        view = self._data[start:start + len(self)]
+        view.flags.writeable = False
+        return view
+
+    def __array__(self, dtype=None, copy=None):
+        view = self.array()
+        return view.astype(dtype) if dtype is not None else view
+
+    def __getitem__(self, key):
+        return self.array()[key]
+
+    def __iter__(self):
+        return iter(self.array().tolist())
+
+    def clear(self) -> None:
+        self._count = 0
+        self._skipped = 0
+
+    def resized(self, capacity: int) -> "RingBuffer":
+        """Copy with a new capacity, keeping the most recent samples."""
+        other = type(self)(capacity, self._data.dtype)
+        recent = self.array()[-other.capacity:]
+        other.extend(recent)
+        other._skipped = self.total - len(recent)
+        return other
+
+    def __repr__(self):
+        return f"{type(self).__name__}({len(self)}/{self.capacity}, total={self.total})"
+
+
+class TraceBuffer(RingBuffer):
+    """RingBuffer of a neuron trace with a min/max pyramid on top.
+
+    Level k holds the min and max of every aligned block of 2**k samples
+    (as rings sized for the blocks inside the horizon).  A block is written
+    once, when its second half completes, so append() is amortized O(1).
+    On top of it:
+    - minmax() gives the range of any window in O(log n) (autoscale),
+    - envelope() reduces the window to one (min, max) per pixel column
+      from the coarsest level that still resolves a column, so drawing
+      costs O(width) whatever the history length.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_HORIZON, dtype=np.float64):
+        super().__init__(max(2, int(capacity)), dtype)
+        self._levels = max(1, (self.capacity - 1).bit_length())
+        sizes = [0] + [(self.capacity >> k) + 2 for k in range(1, self._levels + 1)]
+        self._mins = [None] + [np.zeros(n) for n in sizes[1:]]
+        self._maxs = [None] + [np.zeros(n) for n in sizes[1:]]
+
+    def append(self, value) -> None:
+        i = self._count
+        super().append(value)
+        lo = hi = float(value)
+        j = i
+        for k in range(1, self._levels + 1):
+            if not j & 1:
+                break  # first half of its parent block: nothing completes
+            slo, shi = self._block(k - 1, j - 1)
+            lo, hi = min(lo, slo), max(hi, shi)
+            j >>= 1
+            n = len(self._mins[k])
+            self._mins[k][j % n] = lo
+            self._maxs[k][j % n] = hi
+
+    def _block(self, level: int, j: int):
+        if level == 0:
+            v = float(self._data[j % self.capacity])
+            return v, v
+        n = len(self._mins[level])
+        return float(self._mins[level][j % n]), float(self._maxs[level][j % n])
+
+    def _window(self, start, stop):
+        """Absolute sample range [a, b) of the kept samples [start:stop]."""
+        start, stop, _ = slice(start, stop).indices(len(self))
+        base = self._count - len(self)
+        return base + start, base + max(start, stop)
+
+    def minmax(self, start=None, stop=None):
+        """(min, max) of the kept samples [start:stop], or None if empty."""
+        a, b = self._window(start, stop)
+        if a >= b:
+            return None
+        lo, hi = np.inf, -np.inf
+        level = 0
+        while a < b:
+            if level == self._levels:
+                for j in range(a, b):
+                    blo, bhi = self._block(level, j)
+                    lo, hi = min(lo, blo), max(hi, bhi)
+                break
+            if a & 1:
+                blo, bhi = self._block(level, a)
+                lo, hi = min(lo, blo), max(hi, bhi)
+                a += 1
+            if b & 1:
+                b -= 1
+                blo, bhi = self._block(level, b)
+                lo, hi = min(lo, blo), max(hi, bhi)
+            a >>= 1
+            b >>= 1
+            level += 1
+        return lo, hi
+
+    def envelope(self, width: int, start=None, stop=None):
+        """(x, lo, hi) for drawing [start:stop] on `width` pixel columns.
+
+        x is each point's offset in samples from `start`.  With no more
+        samples than columns this is the raw trace (lo == hi); otherwise
+        one (min, max) per column.
+        """
+        a, b = self._window(start, stop)
+        n = b - a
+        width = max(1, int(width))
+        base = self._count - len(self)
+        raw = self.array()
+        if n <= width:
+            values = raw[a - base:b - base]
+            return np.arange(n, dtype=np.float64), values, values
+
+        # coarsest level whose blocks are no wider than a column
+        level = min(self._levels, (n // width).bit_length() - 1)
+        size = 1 << level
+        j0, j1 = -(-a // size), b // size
+        if level == 0 or j1 <= j0:
+            level, size, j0, j1 = 0, 1, a, b
+        if level:
+            ring = len(self._mins[level])
+            idx = np.arange(j0, j1) % ring
+            head = raw[a - base:j0 * size - base]
+            tail = raw[j1 * size - base:b - base]
+            mins = np.concatenate((head, self._mins[level][idx], tail))
+            maxs = np.concatenate((head, self._maxs[level][idx], tail))
+            starts = np.concatenate((np.arange(a, j0 * size), np.arange(j0, j1) * size,
+                                     np.arange(j1 * size, b))) - a
+        else:
+            mins = maxs = raw[a - base:b - base]
+            starts = np.arange(n)
+
+        column = starts * width // n
+        groups = np.flatnonzero(np.diff(column)) + 1
+        groups = np.concatenate(([0], groups))
+        return (starts[groups].astype(np.float64),
+                np.minimum.reduceat(mins, groups), np.maximum.reduceat(maxs, groups))